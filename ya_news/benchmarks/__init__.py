@@ -0,0 +1,71 @@
+"""
+Бенчмарки YaNews.
+
+Запускаются из каталога ya_news как модули, например:
+
+    python -m benchmarks.home_page_memory
+
+Каждый бенчмарк работает на временной тестовой базе данных,
+рабочая db.sqlite3 не затрагивается.
+"""
+import os
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import django
+
+
+def setup() -> None:
+    """Настраивает Django для запуска вне manage.py."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanews.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database(name: Optional[str] = None) -> Iterator[None]:
+    """
+    Создаёт временную базу данных и удаляет её по выходу из блока.
+
+    name — путь к файлу базы; по умолчанию SQLite держит её в памяти.
+    """
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment, teardown_test_environment
+    )
+
+    setup_test_environment()
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timeit(func: Callable[[], object], repeat: int = 5) -> float:
+    """Возвращает лучшее время выполнения func в секундах."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def latencies(func: Callable[[], object], requests: int) -> List[float]:
+    """Время каждого из requests вызовов func в секундах."""
+    samples = []
+    for _ in range(requests):
+        start = perf_counter()
+        func()
+        samples.append(perf_counter() - start)
+    return samples
+
+
+def percentile(samples: Sequence[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
@@ -0,0 +1,139 @@
+"""
+Пропускная способность и p99 главной страницы и страницы новости
+под WSGI и под ASGI.
+
+Запросы передаются приложениям Django напрямую, без сети: WSGI —
+из пула потоков, как у многопоточного сервера, ASGI — корутинами
+в одном цикле событий, как у uvicorn. Представления одни и те же,
+под ASGI Django выполняет их через sync_to_async. Все запросы
+анонимные.
+
+    python -m benchmarks.asgi_vs_wsgi
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from typing import Callable, List, Tuple
+from wsgiref.util import setup_testing_defaults
+
+from benchmarks import percentile, setup, test_database
+
+CONCURRENCY = 16
+REQUESTS = 2_000
+NEWS = 10
+COMMENTS_PER_NEWS = 50
+HOST = 'localhost'
+
+
+def wsgi_get(application, path: str) -> int:
+    environ = {}
+    setup_testing_defaults(environ)
+    environ.update(PATH_INFO=path, HTTP_HOST=HOST, SERVER_NAME=HOST)
+    statuses = []
+    response = application(
+        environ, lambda status, headers, *args: statuses.append(status)
+    )
+    try:
+        b''.join(response)
+    finally:
+        response.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, path: str) -> int:
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', HOST.encode())],
+        'server': (HOST, 80),
+        'client': ('127.0.0.1', 50000),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+def run_wsgi(application, path: str) -> Tuple[float, List[float]]:
+    def timed(_) -> float:
+        start = perf_counter()
+        assert wsgi_get(application, path) == 200
+        return perf_counter() - start
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        samples = list(pool.map(timed, range(REQUESTS)))
+    return perf_counter() - start, samples
+
+
+def run_asgi(application, path: str) -> Tuple[float, List[float]]:
+    async def client(samples: List[float], requests: int) -> None:
+        for _ in range(requests):
+            start = perf_counter()
+            assert await asgi_get(application, path) == 200
+            samples.append(perf_counter() - start)
+
+    async def load() -> List[float]:
+        samples = []
+        await asyncio.gather(*(
+            client(samples, REQUESTS // CONCURRENCY)
+            for _ in range(CONCURRENCY)
+        ))
+        return samples
+
+    start = perf_counter()
+    samples = asyncio.run(load())
+    return perf_counter() - start, samples
+
+
+def report(name: str, run: Callable[[], Tuple[float, List[float]]]) -> None:
+    run()
+    elapsed, samples = run()
+    print(f'{name:>24} {len(samples) / elapsed:>10.0f} '
+          f'{percentile(samples, 50) * 1000:>9.2f} '
+          f'{percentile(samples, 99) * 1000:>9.2f}')
+
+
+def main() -> None:
+    from django.contrib.auth.models import User
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+    from django.urls import reverse
+
+    from news.models import News
+    from news.seeding import seed_synthetic
+
+    seed_synthetic(
+        NEWS, COMMENTS_PER_NEWS, User.objects.create(username='Бенчмарк')
+    )
+    wsgi = get_wsgi_application()
+    asgi = get_asgi_application()
+    pages = {
+        'главная': reverse('news:home'),
+        'новость': reverse('news:detail', args=(News.objects.first().pk,)),
+    }
+    print(f'Одновременных клиентов: {CONCURRENCY}, запросов: {REQUESTS}.')
+    print(f'{"":>24} {"запр./с":>10} {"p50, мс":>9} {"p99, мс":>9}')
+    for page, path in pages.items():
+        print(page)
+        report('WSGI', lambda: run_wsgi(wsgi, path))
+        report('ASGI', lambda: run_asgi(asgi, path))
+
+
+if __name__ == '__main__':
+    setup()
+    with test_database():
+        main()
@@ -0,0 +1,64 @@
+"""
+Задержка главной страницы для анонимных пользователей с кэшем и без него.
+
+Имитирует нагрузку, в которой чтения преобладают: на каждые
+WRITE_EVERY запросов приходится один новый комментарий.
+"""
+from benchmarks import latencies, percentile, setup, test_database
+
+REQUESTS = 2_000
+WRITE_EVERY = 200
+COMMENTS_PER_NEWS = 500
+
+NO_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+def main() -> None:
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    from news.models import Comment, News
+    from news.seeding import seed_synthetic
+
+    author = User.objects.create(username='Бенчмарк')
+    seed_synthetic(
+        settings.NEWS_COUNT_ON_HOME_PAGE, COMMENTS_PER_NEWS, author
+    )
+    news_list = list(News.objects.all())
+    client = Client()
+    url = reverse('news:home')
+    counter = iter(range(REQUESTS))
+
+    def read_mostly():
+        if next(counter) % WRITE_EVERY == 0:
+            Comment.objects.create(
+                news=news_list[0], author=author, text='Комментарий'
+            )
+        client.get(url)
+
+    client.get(url)
+    print(f'{"":>12} {"p50, мс":>9} {"p99, мс":>9}')
+    with override_settings(CACHES=NO_CACHE, NEWS_CACHE_ALIAS='dummy'):
+        samples = latencies(read_mostly, REQUESTS)
+    print(f'{"без кэша":>12} {percentile(samples, 50) * 1000:>9.2f} '
+          f'{percentile(samples, 99) * 1000:>9.2f}')
+    counter = iter(range(REQUESTS))
+    samples = latencies(read_mostly, REQUESTS)
+    print(f'{"с кэшем":>12} {percentile(samples, 50) * 1000:>9.2f} '
+          f'{percentile(samples, 99) * 1000:>9.2f}')
+
+
+if __name__ == '__main__':
+    setup()
+    with test_database():
+        main()
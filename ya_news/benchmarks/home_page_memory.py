@@ -0,0 +1,83 @@
+"""
+Память, расходуемая на главную страницу, в зависимости от числа комментариев.
+
+Сравнивает прежний способ (prefetch_related всех комментариев и подсчёт
+их в шаблоне) с аннотацией количества комментариев подзапросом.
+Кэш главной страницы выключен: иначе замерялась бы выдача из кэша.
+"""
+import tracemalloc
+from typing import Callable
+
+from benchmarks import setup, test_database
+
+COMMENTS_PER_NEWS = (0, 100, 1_000, 10_000)
+
+NO_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+def peak_memory(func: Callable[[], object]) -> int:
+    """Пиковый объём памяти (в байтах), выделенной при вызове func."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from django.test.utils import override_settings
+    from django.urls import reverse
+
+    from news.models import Comment, News
+
+    author = User.objects.create(username='Бенчмарк')
+    News.objects.bulk_create(
+        News(title=f'Новость {index}', text='Текст')
+        for index in range(settings.NEWS_COUNT_ON_HOME_PAGE)
+    )
+    news_list = list(News.objects.all())
+    client = Client()
+    url = reverse('news:home')
+
+    def legacy():
+        for news in News.objects.prefetch_related(
+            'comment_set'
+        )[:settings.NEWS_COUNT_ON_HOME_PAGE]:
+            if news.comment_set.all():
+                news.comment_set.count()
+
+    # bulk_create не отправляет сигналов и не сбросил бы кэш.
+    with override_settings(CACHES=NO_CACHE, NEWS_CACHE_ALIAS='dummy'):
+        # Первый запрос компилирует шаблоны, в замеры он не входит.
+        client.get(url)
+        print(f'{"комментариев на новость":>24} {"prefetch, КиБ":>14} '
+              f'{"аннотация, КиБ":>15}')
+        created = 0
+        for comments_per_news in COMMENTS_PER_NEWS:
+            Comment.objects.bulk_create(
+                Comment(news=news, author=author, text='Комментарий ' * 20)
+                for news in news_list
+                for _ in range(comments_per_news - created)
+            )
+            created = comments_per_news
+            legacy_peak = peak_memory(legacy)
+            current_peak = peak_memory(lambda: client.get(url))
+            print(f'{comments_per_news:>24} {legacy_peak / 1024:>14.0f} '
+                  f'{current_peak / 1024:>15.0f}')
+
+
+if __name__ == '__main__':
+    setup()
+    with test_database():
+        main()
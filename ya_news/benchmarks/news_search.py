@@ -0,0 +1,87 @@
+"""
+Задержка полнотекстового поиска news.search.search_news
+на больших объёмах комментариев.
+
+Тексты составлены из синтетического словаря с частотами по закону
+Ципфа; запросы берутся из слов разной частоты. Число комментариев
+задаётся первым аргументом, по умолчанию два миллиона:
+
+    python -m benchmarks.news_search 200000
+"""
+import random
+import sys
+from itertools import accumulate
+
+from benchmarks import latencies, percentile, setup, test_database
+
+COMMENTS = 2_000_000
+NEWS = 10_000
+REQUESTS = 50
+VOCABULARY = 50_000
+SYLLABLES = ('ка', 'ро', 'ми', 'ту', 'ле', 'на', 'со', 'пи', 'ва', 'ды')
+# Ранги слов, из которых составляются запросы.
+BANDS = {'частые': 100, 'средние': 1_000, 'редкие': 10_000}
+
+
+def make_vocabulary(rng: random.Random) -> tuple:
+    """Слова словаря и накопленные частоты по закону Ципфа."""
+    words = sorted({
+        ''.join(rng.choices(SYLLABLES, k=rng.randint(3, 7)))
+        for _ in range(VOCABULARY)
+    })
+    rng.shuffle(words)
+    return words, list(accumulate(
+        1 / rank for rank in range(1, len(words) + 1)
+    ))
+
+
+def seed(comments: int, words: list, weights: list,
+         rng: random.Random) -> None:
+    from django.contrib.auth.models import User
+    from django.db import connection
+
+    from news import search
+    from news.models import Comment, News
+    from news.seeding import bulk_create
+
+    def phrase(length: int) -> str:
+        return ' '.join(rng.choices(words, cum_weights=weights, k=length))
+
+    author = User.objects.create(username='Бенчмарк')
+    bulk_create(News, (
+        News(title=phrase(4)[:50], text=phrase(60)) for _ in range(NEWS)
+    ))
+    news_ids = list(News.objects.values_list('pk', flat=True))
+    bulk_create(Comment, (
+        Comment(
+            news_id=rng.choice(news_ids), author=author, text=phrase(20)
+        )
+        for _ in range(comments)
+    ), batch_size=10_000)
+    search.rebuild(connection)
+
+
+def main(comments: int) -> None:
+    from django.conf import settings
+
+    from news.search import search_news
+
+    rng = random.Random(0)
+    words, weights = make_vocabulary(rng)
+    seed(comments, words, weights, rng)
+    limit = settings.NEWS_COUNT_ON_SEARCH_PAGE
+    print(f'Новостей: {NEWS}, комментариев: {comments}.')
+    print(f'{"":>10} {"p50, мс":>9} {"p95, мс":>9}')
+    for band, rank in BANDS.items():
+        queries = iter(words[rank:rank + REQUESTS])
+        samples = latencies(
+            lambda: search_news(next(queries), limit), REQUESTS
+        )
+        print(f'{band:>10} {percentile(samples, 50) * 1000:>9.2f} '
+              f'{percentile(samples, 95) * 1000:>9.2f}')
+
+
+if __name__ == '__main__':
+    setup()
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else COMMENTS)
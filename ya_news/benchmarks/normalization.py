@@ -0,0 +1,38 @@
+"""
+Пропускная способность нормализации текста перед поиском
+запрещённых слов (news.moderation.normalize) и полной проверки
+комментария нормализацией и поиском.
+"""
+import random
+
+from benchmarks import setup, timeit
+
+TEXT_SIZES = (1_000, 100_000, 1_000_000)
+SAMPLE = (
+    'Обычный комментарий к новости, с запятыми и точками. '
+    'Иногда в нём встречаются latin letters, цифры 123 и р.а.з.р.я.д.к.а. '
+)
+
+
+def main() -> None:
+    from news.forms import BAD_WORDS
+    from news.moderation import get_word_filter, normalize
+
+    rng = random.Random(0)
+    word_filter = get_word_filter(BAD_WORDS)
+    print(f'{"символов":>10} {"normalize, МБ/с":>16} {"проверка, МБ/с":>15}')
+    for size in TEXT_SIZES:
+        chunks = []
+        while sum(map(len, chunks)) < size:
+            chunks.append(SAMPLE[rng.randrange(len(SAMPLE)):])
+        text = ''.join(chunks)[:size]
+        megabytes = len(text.encode()) / 2 ** 20
+        normalize_time = timeit(lambda: normalize(text))
+        check_time = timeit(lambda: word_filter.search(normalize(text)))
+        print(f'{size:>10} {megabytes / normalize_time:>16.1f} '
+              f'{megabytes / check_time:>15.1f}')
+
+
+if __name__ == '__main__':
+    setup()
+    main()
@@ -0,0 +1,129 @@
+"""
+Пропускная способность при одновременных чтениях и записях
+в профилях базы данных development и production.
+
+Читатели открывают страницы новостей, писатели добавляют к ним
+комментарии, каждый в своём потоке со своим соединением. База
+лежит в файле: режим WAL для базы в памяти недоступен.
+
+    python -m benchmarks.sqlite_profile
+"""
+import random
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Barrier, Event, Thread
+from time import perf_counter, sleep
+from typing import Dict, Iterator
+
+from benchmarks import setup, test_database
+
+READERS = 6
+WRITERS = 2
+DURATION = 5
+NEWS = 10
+COMMENTS_PER_NEWS = 100
+
+NO_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'dummy': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
+}
+
+
+@contextmanager
+def database_profile(profile: str) -> Iterator[None]:
+    """Включает профиль так же, как settings.py по DATABASE_PROFILE."""
+    from django.conf import settings
+    from django.test.utils import override_settings
+
+    database = settings.DATABASES['default']
+    old_max_age = database.get('CONN_MAX_AGE', 0)
+    production = profile == 'production'
+    database['CONN_MAX_AGE'] = 60 * 10 if production else 0
+    pragmas = settings.SQLITE_PRODUCTION_PRAGMAS if production else {}
+    try:
+        # Без кэша страниц каждое чтение доходит до базы.
+        with override_settings(
+            SQLITE_PRAGMAS=pragmas, CACHES=NO_CACHE, NEWS_CACHE_ALIAS='dummy'
+        ):
+            yield
+    finally:
+        database['CONN_MAX_AGE'] = old_max_age
+
+
+def run_load() -> Dict[str, int]:
+    from django.contrib.auth.models import User
+    from django.db import OperationalError, connection
+    from django.test import Client
+    from django.urls import reverse
+
+    from news.models import News
+    from news.seeding import seed_synthetic
+
+    author = User.objects.create(username='Бенчмарк')
+    seed_synthetic(NEWS, COMMENTS_PER_NEWS, author)
+    urls = [
+        reverse('news:detail', args=(pk,))
+        for pk in News.objects.values_list('pk', flat=True)
+    ]
+    counts = {'чтения': 0, 'записи': 0, 'ошибки': 0}
+    start = Barrier(READERS + WRITERS + 1)
+    stop = Event()
+
+    def worker(kind: str, number: int) -> None:
+        rng = random.Random(number)
+        client = Client()
+        if kind == 'записи':
+            client.force_login(author)
+        start.wait()
+        try:
+            while not stop.is_set():
+                url = rng.choice(urls)
+                try:
+                    if kind == 'записи':
+                        client.post(url, data={'text': 'Комментарий'})
+                    else:
+                        client.get(url)
+                except OperationalError:
+                    counts['ошибки'] += 1
+                else:
+                    counts[kind] += 1
+        finally:
+            connection.close()
+
+    threads = [
+        Thread(target=worker, args=(kind, number))
+        for number, kind in enumerate(
+            ['чтения'] * READERS + ['записи'] * WRITERS
+        )
+    ]
+    for thread in threads:
+        thread.start()
+    start.wait()
+    began = perf_counter()
+    sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - began
+    return {kind: round(count / elapsed) for kind, count in counts.items()}
+
+
+def main() -> None:
+    print(f'Читателей: {READERS}, писателей: {WRITERS}; запросов в секунду.')
+    print(f'{"":>12} {"чтения":>8} {"записи":>8} {"ошибки":>8}')
+    for profile in ('development', 'production'):
+        with TemporaryDirectory() as directory, database_profile(profile):
+            with test_database(str(Path(directory) / 'db.sqlite3')):
+                rates = run_load()
+        print(f'{profile:>12} {rates["чтения"]:>8} {rates["записи"]:>8} '
+              f'{rates["ошибки"]:>8}')
+
+
+if __name__ == '__main__':
+    setup()
+    main()
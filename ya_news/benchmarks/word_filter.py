@@ -0,0 +1,54 @@
+"""
+Проверка комментария на запрещённые слова: прежний цикл по словарю
+против скомпилированных движков из news.moderation.
+
+Словари по 10, 1 000 и 10 000 слов, длинный комментарий без
+запрещённых слов (худший случай — текст просматривается целиком).
+"""
+import random
+
+from benchmarks import setup, timeit
+
+DICTIONARY_SIZES = (10, 1_000, 10_000)
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+COMMENT_WORDS = 2_000
+
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(5, 10)))
+
+
+def main() -> None:
+    from news.moderation import AhoCorasickFilter, RegexFilter
+
+    rng = random.Random(0)
+    comment = ' '.join(random_word(rng) for _ in range(COMMENT_WORDS))
+    print(f'Комментарий: {len(comment)} символов.')
+    print(f'{"слов":>7} {"цикл, мс":>10} {"regex, мс":>10} '
+          f'{"Ахо-Корасик, мс":>16} {"компиляция regex, мс":>21}')
+    for size in DICTIONARY_SIZES:
+        # Слова длиннее слов комментария, поэтому совпадений нет.
+        words = [random_word(rng) + 'ъъ' for _ in range(size)]
+
+        def loop():
+            lowered_text = comment.lower()
+            return any(word in lowered_text for word in words)
+
+        compile_time = timeit(lambda: RegexFilter(words), repeat=1)
+        regex = RegexFilter(words)
+        aho_corasick = AhoCorasickFilter(words)
+        regex_time = timeit(lambda: regex.search(comment.lower()))
+        aho_corasick_time = timeit(
+            lambda: aho_corasick.search(comment.lower())
+        )
+        print(
+            f'{size:>7} {timeit(loop) * 1000:>10.2f} '
+            f'{regex_time * 1000:>10.2f} '
+            f'{aho_corasick_time * 1000:>16.2f} '
+            f'{compile_time * 1000:>21.2f}'
+        )
+
+
+if __name__ == '__main__':
+    setup()
+    main()
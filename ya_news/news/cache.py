@@ -0,0 +1,137 @@
+"""
+Кэширование страниц YaNews.
+
+Все функции работают с кэшем settings.NEWS_CACHE_ALIAS, так что
+бэкенд (locmem, memcached, redis, файловый) выбирается в CACHES.
+Ключи страниц содержат номер версии: чтобы сбросить страницу,
+достаточно увеличить версию, а старые записи истекут сами.
+"""
+import re
+from time import time
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.http import HttpResponse
+from django.template.loader import get_template
+from django.template.response import SimpleTemplateResponse
+from django.utils.safestring import SafeString, mark_safe
+
+from .routers import primary_reads
+
+HOME_PAGE_VERSION_KEY = 'news:home:version'
+HOME_PAGE_STALE_KEY = 'news:home:stale'
+# Метка, которую includes/comments.html оставляет на месте ссылок
+# «Редактировать | Удалить»: <!--comment-controls id_комментария id_автора-->
+COMMENT_CONTROLS = re.compile(r'<!--comment-controls (\d+) (\d+)-->')
+
+
+def get_cache() -> BaseCache:
+    return caches[settings.NEWS_CACHE_ALIAS]
+
+
+def initial_version() -> int:
+    """
+    Начальное значение счётчика версии.
+
+    Берём текущее время в миллисекундах: если счётчик вытеснят из кэша,
+    новая версия не совпадёт ни с одной из выданных ранее.
+    """
+    return int(time() * 1000)
+
+
+def get_version(key: str) -> int:
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key: str) -> None:
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), None)
+
+
+def home_page_key() -> str:
+    return f'news:home:{get_version(HOME_PAGE_VERSION_KEY)}'
+
+
+def invalidate_home_page() -> None:
+    bump_version(HOME_PAGE_VERSION_KEY)
+
+
+def comments_version_key(news_id: int) -> str:
+    return f'news:{news_id}:comments:version'
+
+
+def comments_fragment_key(
+    news_id: int, url_name: str, cursor: Optional[str]
+) -> str:
+    version = get_version(comments_version_key(news_id))
+    return f'news:{news_id}:comments:{version}:{url_name}:{cursor or ""}'
+
+
+def invalidate_comments(news_id: int) -> None:
+    bump_version(comments_version_key(news_id))
+
+
+def add_comment_controls(fragment: str, user) -> SafeString:
+    """
+    Подставляет в закэшированный список комментариев ссылки управления.
+
+    Ссылки появляются только у комментариев пользователя user,
+    остальные метки удаляются. Список при этом не перерендеривается.
+    """
+    controls = get_template('includes/comment_controls.html')
+
+    def replace(match):
+        comment_id, author_id = map(int, match.groups())
+        if author_id != user.pk:
+            return ''
+        return controls.render({'comment_id': comment_id})
+
+    return mark_safe(COMMENT_CONTROLS.sub(replace, fragment))
+
+
+def cached_page(
+    key: str,
+    render: Callable[[], SimpleTemplateResponse],
+    stale_key: str,
+) -> HttpResponse:
+    """
+    Отдаёт страницу из кэша или собирает её вызовом render().
+
+    Пересобирает страницу только тот процесс, который первым захватил
+    блокировку. Остальные до конца пересборки получают предыдущую
+    версию страницы из stale_key, чтобы после инвалидации все
+    воркеры разом не пошли в базу данных.
+    """
+    cache = get_cache()
+    content = cache.get(key)
+    if content is not None:
+        return HttpResponse(content)
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, True, settings.NEWS_CACHE_LOCK_TIMEOUT):
+        content = cache.get(stale_key)
+        if content is not None:
+            return HttpResponse(content)
+        # Кэш ещё ни разу не заполнялся: ждать некого, собираем сами.
+        return render().render()
+    try:
+        # Страницу увидят все: читаем её из основной базы,
+        # а не из отстающей реплики.
+        with primary_reads():
+            response = render().render()
+        if response.status_code == 200:
+            cache.set(
+                key, response.content, settings.NEWS_PAGE_CACHE_TIMEOUT
+            )
+            cache.set(stale_key, response.content, None)
+        return response
+    finally:
+        cache.delete(lock_key)
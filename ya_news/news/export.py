@@ -0,0 +1,55 @@
+"""
+Потоковая выгрузка новостей и комментариев в NDJSON.
+
+Каждая строка — объект в формате фикстур Django (model, pk, fields),
+поэтому выгрузку можно загрузить обратно: manage.py loaddata news.jsonl.
+Строки читаются из базы порциями через .iterator(), так что расход
+памяти не зависит от размера таблиц.
+"""
+import json
+from datetime import datetime
+from typing import Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, News
+
+EXPORT_FIELDS = {
+    News: ('title', 'text', 'date'),
+    Comment: ('news', 'author', 'text', 'created'),
+}
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """
+    Сохраняет время с микросекундами.
+
+    DjangoJSONEncoder округляет его до миллисекунд, и после загрузки
+    выгрузки менялся бы порядок комментариев, созданных в одну
+    миллисекунду.
+    """
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def iter_records(chunk_size: int = 2000) -> Iterator[dict]:
+    """Сначала все новости, затем комментарии — как того требует loaddata."""
+    for model, fields in EXPORT_FIELDS.items():
+        label = model._meta.label_lower
+        rows = model.objects.order_by('pk').values_list('pk', *fields)
+        for pk, *values in rows.iterator(chunk_size=chunk_size):
+            yield {
+                'model': label,
+                'pk': pk,
+                'fields': dict(zip(fields, values)),
+            }
+
+
+def iter_lines(chunk_size: int = 2000) -> Iterator[str]:
+    for record in iter_records(chunk_size):
+        yield json.dumps(
+            record, cls=ExportEncoder, ensure_ascii=False
+        ) + '\n'
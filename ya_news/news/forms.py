@@ -1,7 +1,8 @@
-from django.forms import ModelForm
+from django.forms import HiddenInput, IntegerField, ModelForm
 from django.core.exceptions import ValidationError
 
 from .models import Comment
+from .moderation import get_word_filter, normalize
 
 BAD_WORDS = (
     'редиска',
@@ -9,19 +10,28 @@ BAD_WORDS = (
     # Дополните список на своё усмотрение.
 )
 WARNING = 'Не ругайтесь!'
+CONFLICT = (
+    'Комментарий изменили, пока вы его редактировали. Ниже — текущий '
+    'текст: перенесите в форму нужные изменения и сохраните ещё раз.'
+)
 
 
 class CommentForm(ModelForm):
+    # Версия комментария, которую видел пользователь:
+    # Comment.save_if_version не даст сохранить правку поверх более новой.
+    version = IntegerField(widget=HiddenInput, required=False, min_value=1)
 
     class Meta:
         model = Comment
         fields = ('text',)
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['version'].initial = self.instance.version
+
     def clean_text(self):
         """Не позволяем ругаться в комментариях."""
         text = self.cleaned_data['text']
-        lowered_text = text.lower()
-        for word in BAD_WORDS:
-            if word in lowered_text:
-                raise ValidationError(WARNING)
+        if get_word_filter(BAD_WORDS).search(normalize(text)):
+            raise ValidationError(WARNING)
         return text
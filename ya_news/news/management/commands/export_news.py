@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from news.export import iter_lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает новости и комментарии в NDJSON, совместимый с loaddata '
+        '(файл с расширением .jsonl).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл для выгрузки. По умолчанию — стандартный вывод.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за один раз.'
+        )
+
+    def handle(self, *args, output, chunk_size, **options):
+        if output is None:
+            # Строки уже заканчиваются переводом строки.
+            self.stdout.ending = ''
+            self.stdout.writelines(iter_lines(chunk_size))
+            return
+        with open(output, 'w', encoding='utf-8') as destination:
+            destination.writelines(iter_lines(chunk_size))
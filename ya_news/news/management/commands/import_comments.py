@@ -0,0 +1,181 @@
+import json
+import sys
+from itertools import islice
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from news import search
+from news.cache import invalidate_comments, invalidate_home_page
+from news.forms import BAD_WORDS
+from news.models import Comment, News
+from news.moderation import get_word_filter, normalize
+
+User = get_user_model()
+
+
+def insert_comments(comments: List[Comment]) -> None:
+    """
+    Вставляет комментарии одним запросом в обход модели.
+
+    bulk_create заменил бы дату из архива текущей: у поля created
+    стоит auto_now_add.
+    """
+    meta = Comment._meta
+    fields = [
+        field for field in meta.local_concrete_fields
+        if field is not meta.pk
+    ]
+    quote_name = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote_name(meta.db_table),
+        ', '.join(quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [
+                field.get_db_prep_save(
+                    getattr(comment, field.attname), connection
+                )
+                for field in fields
+            ]
+            for comment in comments
+        ])
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует комментарии из JSONL: по объекту на строку с полями '
+        'news (id новости), author (имя пользователя), text и '
+        'необязательным created (ISO 8601).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл JSONL или «-» для стандартного ввода.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько комментариев вставлять одной транзакцией.'
+        )
+
+    def handle(self, *args, path, batch_size, **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        self.word_filter = get_word_filter(BAD_WORDS)
+        self.stats = dict.fromkeys(('imported', 'rejected', 'skipped'), 0)
+        self.touched_news = set()
+        comments_after = search.last_pk(Comment)
+        start = perf_counter()
+        source = sys.stdin if path == '-' else open(path, encoding='utf-8')
+        try:
+            rows = self.read_rows(source)
+            batches = iter(lambda: list(islice(rows, batch_size)), [])
+            for batch in batches:
+                self.import_batch(batch)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+            # Пачки фиксируются по отдельности: вставленное до ошибки
+            # в файле тоже должно попасть в индекс и на страницы.
+            if self.touched_news:
+                self.publish(comments_after)
+        elapsed = perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            'Импортировано: {imported}, отклонено фильтром: {rejected}, '
+            'пропущено: {skipped}.'.format(**self.stats)
+        ))
+        self.stdout.write(
+            f'{self.stats["imported"] / elapsed:.0f} строк/с '
+            f'за {elapsed:.1f} с.'
+        )
+
+    def publish(self, comments_after: int) -> None:
+        """Индексирует вставленные комментарии и сбрасывает кэш страниц."""
+        # Вставка в обход модели не отправляет сигналы, индексируем новое сами.
+        search.index_new(
+            connection, search.last_pk(News), comments_after
+        )
+        invalidate_home_page()
+        for news_id in self.touched_news:
+            invalidate_comments(news_id)
+
+    def read_rows(self, source) -> Iterator[Dict]:
+        for line_number, line in enumerate(source, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise CommandError(f'Строка {line_number}: {error}.')
+
+    def parse_row(self, row, now) -> Optional[Dict]:
+        """
+        Проверяет поля строки архива и разбирает дату.
+
+        Для строки, которую нельзя импортировать, возвращает None:
+        она считается пропущенной.
+        """
+        if not isinstance(row, dict):
+            return None
+        news, author = row.get('news'), row.get('author')
+        text, created = row.get('text'), row.get('created') or None
+        if not (
+            isinstance(news, int) and isinstance(author, str)
+            and isinstance(text, str) and text
+            and isinstance(created, (str, type(None)))
+        ):
+            return None
+        if created is None:
+            created = now
+        else:
+            try:
+                created = parse_datetime(created)
+            except ValueError:
+                # Формат верный, но такой даты нет: 2020-13-45.
+                return None
+            if created is None:
+                # Не ISO 8601.
+                return None
+        if timezone.is_naive(created):
+            created = timezone.make_aware(created)
+        return dict(news=news, author=author, text=text, created=created)
+
+    def import_batch(self, batch: List) -> None:
+        """Вставляет пачку одним запросом; авторы — одним запросом."""
+        now = timezone.now()
+        rows = [
+            row for row in (self.parse_row(row, now) for row in batch) if row
+        ]
+        self.stats['skipped'] += len(batch) - len(rows)
+        authors = dict(User.objects.filter(
+            username__in={row['author'] for row in rows}
+        ).values_list('username', 'pk'))
+        news_ids = set(News.objects.filter(
+            pk__in={row['news'] for row in rows}
+        ).values_list('pk', flat=True))
+        comments = []
+        for row in rows:
+            if row['author'] not in authors or row['news'] not in news_ids:
+                self.stats['skipped'] += 1
+                continue
+            if self.word_filter.search(normalize(row['text'])):
+                self.stats['rejected'] += 1
+                continue
+            comments.append(Comment(
+                news_id=row['news'],
+                author_id=authors[row['author']],
+                text=row['text'],
+                created=row['created'],
+            ))
+        if comments:
+            with transaction.atomic():
+                insert_comments(comments)
+        self.stats['imported'] += len(comments)
+        self.touched_news.update(comment.news_id for comment in comments)
@@ -0,0 +1,33 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from news import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Перестраивает полнотекстовый индекс новостей и комментариев. '
+        'Нужна после массовых изменений в обход моделей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default='default',
+            help='Псевдоним базы данных из DATABASES.'
+        )
+
+    def handle(self, *args, database, **options):
+        connection = connections[database]
+        if not search.is_available(connection):
+            raise CommandError(
+                'Полнотекстовый индекс недоступен: нужен SQLite с FTS5 '
+                'и применённые миграции news.'
+            )
+        start = perf_counter()
+        with transaction.atomic(using=database):
+            search.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс перестроен за {perf_counter() - start:.1f} с.'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from news.seeding import seed_fixture_news, seed_synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу новостями из фикстуры news.json или, с --news, '
+        'синтетическими новостями и комментариями для нагрузочных тестов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--news', type=int,
+            help='Сколько синтетических новостей создать.'
+        )
+        parser.add_argument(
+            '--comments', type=int, default=0,
+            help='Сколько комментариев создать к каждой новости.'
+        )
+
+    def handle(self, *args, news, comments, **options):
+        if news is None:
+            created = len(seed_fixture_news())
+            self.stdout.write(f'Из фикстуры создано новостей: {created}.')
+            return
+        seed_synthetic(news, comments)
+        self.stdout.write(
+            f'Создано новостей: {news}, комментариев: {news * comments}.'
+        )
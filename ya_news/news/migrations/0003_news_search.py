@@ -0,0 +1,60 @@
+from django.db import OperationalError, migrations
+
+# SQL скопирован из news.search на момент миграции: миграция
+# не должна меняться вместе с модулем.
+FTS_TABLE = 'news_search_fts'
+RANK = 'bm25(3.0, 1.0, 0.0)'
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, text, news_id UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+FILL_TABLE = (
+    f'''
+    INSERT INTO {FTS_TABLE}(rowid, title, text, news_id)
+    SELECT id * 2, title, text, id FROM news_news
+    ''',
+    f'''
+    INSERT INTO {FTS_TABLE}(rowid, title, text, news_id)
+    SELECT id * 2 + 1, '', text, news_id FROM news_comment
+    ''',
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+)
+
+
+def install_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_TABLE)
+        except OperationalError:
+            # SQLite собран без FTS5: поиск будет работать через icontains.
+            return
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES (%s, %s)',
+            ['rank', RANK]
+        )
+        for sql in FILL_TABLE:
+            cursor.execute(sql)
+
+
+def uninstall_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('news', '0002_news_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
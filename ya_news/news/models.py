@@ -1,7 +1,12 @@
 from datetime import datetime
 
 from django.conf import settings
-from django.db import models
+from django.db import models, router
+from django.db.models.signals import post_save
+
+
+class VersionConflict(Exception):
+    """Запись изменили после того, как её прочитали."""
 
 
 class News(models.Model):
@@ -11,6 +16,9 @@ class News(models.Model):
 
     class Meta:
         ordering = ('-date',)
+        indexes = (
+            models.Index(fields=('-date',), name='news_date_idx'),
+        )
         verbose_name_plural = 'Новости'
         verbose_name = 'Новость'
 
@@ -21,7 +29,9 @@ class News(models.Model):
 class Comment(models.Model):
     news = models.ForeignKey(
         News,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # Выборки по news_id обслуживает составной индекс из Meta.indexes.
+        db_index=False,
     )
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -29,9 +39,56 @@ class Comment(models.Model):
     )
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(
+        'Версия', default=1, editable=False
+    )
 
     class Meta:
         ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('news', 'created'),
+                name='comment_news_created_idx'
+            ),
+        )
 
     def __str__(self):
         return self.text[:50]
+
+    def save(self, *args, **kwargs):
+        # Любая запись меняет версию: формы, открытые до неё,
+        # получат конфликт в save_if_version.
+        if not self._state.adding:
+            self.version += 1
+        super().save(*args, **kwargs)
+
+    def save_if_version(self, expected: int) -> None:
+        """
+        Оптимистическая блокировка: сохраняет комментарий, только если
+        в базе всё ещё версия expected.
+
+        Один запрос UPDATE ... WHERE version = expected записывает поля
+        и увеличивает версию. Если версия уже другая, бросает
+        VersionConflict — изменение, сделанное после чтения комментария,
+        не затирается молча. UPDATE не отправляет post_save, поэтому
+        сигнал отправляется здесь: по нему сбрасываются кэши
+        и обновляется поисковый индекс.
+        """
+        fields = [
+            field for field in self._meta.local_concrete_fields
+            if not field.primary_key and field.name != 'version'
+        ]
+        using = router.db_for_write(type(self), instance=self)
+        updated = type(self)._default_manager.using(using).filter(
+            pk=self.pk, version=expected
+        ).update(
+            version=models.F('version') + 1,
+            **{field.attname: field.pre_save(self, False) for field in fields}
+        )
+        if not updated:
+            raise VersionConflict
+        self.version = expected + 1
+        post_save.send(
+            sender=type(self), instance=self, created=False,
+            update_fields=None, raw=False, using=using,
+        )
@@ -0,0 +1,206 @@
+"""
+Поиск запрещённых слов в тексте комментариев.
+
+Перед поиском текст нормализуется (см. normalize), а слова словаря
+сводятся к основам (см. stem), чтобы ловить замену букв латиницей,
+слова «в разрядку» и другие падежные формы.
+
+Словарь один раз компилируется в движок, который находит любое
+из слов за один проход по тексту, независимо от размера словаря.
+Движок выбирается настройкой NEWS_BAD_WORDS_ENGINE. Помимо слов из
+кода можно подключить файл-словарь NEWS_BAD_WORDS_FILE (по слову
+на строку): он перечитывается, как только меняется на диске.
+"""
+import os
+import re
+from abc import ABC, abstractmethod
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Латинские буквы и цифры, похожие на кириллические.
+HOMOGLYPHS = {
+    'a': 'а', 'b': 'в', 'c': 'с', 'e': 'е', 'h': 'н', 'k': 'к',
+    'm': 'м', 'o': 'о', 'p': 'р', 't': 'т', 'x': 'х', 'y': 'у',
+    'u': 'и', 'r': 'г', 'n': 'п', '0': 'о', '3': 'з', '4': 'ч',
+    '6': 'б', '@': 'а', 'ё': 'е',
+}
+# Знаки, которыми разбивают слово: «р.е.д.и.с.к.а», «ред*иска».
+SEPARATORS = '.,-_*~|/\\\'"`+=:;!?#^()[]{}<>'
+NORMALIZATION_TABLE = str.maketrans(
+    {**HOMOGLYPHS, **dict.fromkeys(SEPARATORS)}
+)
+# Пробелы между одиночными буквами: «р е д и с к а».
+SPACED_LETTERS = re.compile(r'(?<!\w)(\w)\s+(?=\w(?!\w))')
+# Окончания, отбрасываемые от слов словаря, от длинных к коротким.
+ENDINGS = (
+    'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ой', 'ей', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев',
+    'ия', 'ие', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ую', 'юю',
+    'а', 'я', 'ы', 'и', 'у', 'ю', 'е', 'о', 'ь', 'й',
+)
+MIN_STEM_LENGTH = 4
+
+
+def normalize(text: str) -> str:
+    """
+    Приводит текст к виду, в котором ищутся слова словаря.
+
+    Регистр и похожие латинские буквы сводятся к строчной кириллице,
+    разделители внутри слов и пробелы между одиночными буквами
+    удаляются. Все шаги — таблица str.translate и одно регулярное
+    выражение — линейны по длине текста.
+    """
+    text = text.lower().translate(NORMALIZATION_TABLE)
+    return SPACED_LETTERS.sub(r'\1', text)
+
+
+def stem(word: str) -> str:
+    """Отбрасывает окончание, если основа остаётся не короче 4 букв."""
+    for ending in ENDINGS:
+        if word.endswith(ending) and (
+            len(word) - len(ending) >= MIN_STEM_LENGTH
+        ):
+            return word[:-len(ending)]
+    return word
+
+
+class WordFilter(ABC):
+    """Базовый класс движка: ищет в тексте вхождение любого из слов."""
+
+    def __init__(self, words: Iterable[str]):
+        self.words = tuple(word.lower() for word in words if word)
+
+    @abstractmethod
+    def search(self, text: str) -> Optional[str]:
+        """Возвращает первое найденное в text слово или None."""
+
+
+class RegexFilter(WordFilter):
+    """
+    Одно регулярное выражение, построенное по префиксному дереву слов.
+
+    Альтернативы сгруппированы по общим префиксам, поэтому в каждой
+    позиции текста проверяется не весь словарь, а одна ветка дерева.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        super().__init__(words)
+        trie: Dict[str, dict] = {}
+        for word in self.words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        # Пустое дерево не должно совпадать с каждой позицией текста.
+        pattern = self._pattern(trie) if trie else '(?!)'
+        self.regex = re.compile(pattern)
+
+    @classmethod
+    def _pattern(cls, node: Dict[str, dict]) -> str:
+        if '' in node:
+            # Слово закончилось. Более длинные слова с тем же началом
+            # искать незачем: их вхождение содержит и это слово.
+            return ''
+        branches = [
+            re.escape(char) + cls._pattern(child)
+            for char, child in sorted(node.items())
+        ]
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:{})'.format('|'.join(branches))
+
+    def search(self, text: str) -> Optional[str]:
+        match = self.regex.search(text)
+        return match.group() if match else None
+
+
+class AhoCorasickFilter(WordFilter):
+    """Автомат Ахо — Корасик: линейное время в худшем случае."""
+
+    def __init__(self, words: Iterable[str]):
+        super().__init__(words)
+        self.goto: List[Dict[str, int]] = [{}]
+        self.output: List[Optional[str]] = [None]
+        for word in self.words:
+            state = 0
+            for char in word:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.output.append(None)
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.output[state] = word
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                if self.output[child] is None:
+                    self.output[child] = self.output[self.fail[child]]
+
+    def search(self, text: str) -> Optional[str]:
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+@lru_cache(maxsize=4)
+def read_dictionary(path: str, mtime: int) -> Tuple[str, ...]:
+    """Читает файл-словарь; mtime участвует в ключе кэша."""
+    with open(path, encoding='utf-8') as dictionary:
+        return tuple(line.strip() for line in dictionary if line.strip())
+
+
+def compile_filter(engine: str, words: Iterable[str]) -> WordFilter:
+    return import_string(engine)(stem(normalize(word)) for word in words)
+
+
+# Скомпилированные фильтры: ключ — движок, путь и mtime файла-словаря
+# и id набора слов из кода, значение — сам набор (чтобы его id
+# не достался другому объекту) и фильтр.
+COMPILED_FILTERS: Dict[
+    Tuple[str, Optional[str], Optional[int], int],
+    Tuple[Tuple[str, ...], WordFilter],
+] = {}
+COMPILED_FILTERS_LIMIT = 8
+
+
+def get_word_filter(words: Tuple[str, ...] = ()) -> WordFilter:
+    """
+    Возвращает скомпилированный фильтр для words и файла-словаря.
+
+    words — неизменяемый кортеж, обычно константа модуля: кэш узнаёт
+    его по id, поэтому проверка не стоит O(размер словаря). Фильтр
+    компилируется заново только при смене движка, изменении файла
+    на диске или другом наборе words. Искать нужно в тексте,
+    пропущенном через normalize.
+    """
+    engine = settings.NEWS_BAD_WORDS_ENGINE
+    path = settings.NEWS_BAD_WORDS_FILE
+    path = str(path) if path else None
+    mtime = os.stat(path).st_mtime_ns if path else None
+    key = (engine, path, mtime, id(words))
+    compiled = COMPILED_FILTERS.get(key)
+    if compiled is not None and compiled[0] is words:
+        return compiled[1]
+    dictionary = read_dictionary(path, mtime) if path else ()
+    word_filter = compile_filter(engine, (*words, *dictionary))
+    if len(COMPILED_FILTERS) >= COMPILED_FILTERS_LIMIT:
+        COMPILED_FILTERS.clear()
+    COMPILED_FILTERS[key] = (words, word_filter)
+    return word_filter
@@ -0,0 +1,71 @@
+"""
+Постраничный вывод комментариев к новости.
+
+Страницы отсчитываются не по номеру, а по курсору — паре (created, id)
+последнего показанного комментария. Запрос следующей страницы
+продолжает просмотр индекса с этого места, поэтому далёкие страницы
+обходятся так же дёшево, как первая.
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import Http404
+
+from .models import Comment, News
+
+
+class CommentPage(NamedTuple):
+    """Страница комментариев и курсор следующей страницы (если она есть)."""
+    comments: List[Comment]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(comment: Comment) -> str:
+    """Кодирует ключ комментария в непрозрачную строку для URL."""
+    raw = f'{comment.created.isoformat()}|{comment.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Восстанавливает (created, id) из курсора, либо отдаёт 404."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created, pk = raw.split('|')
+        return datetime.fromisoformat(created), int(pk)
+    except (ValueError, UnicodeError, binascii.Error):
+        raise Http404('Некорректный курсор страницы комментариев.')
+
+
+def get_comments_page(
+    news: News,
+    cursor: Optional[str] = None,
+    per_page: Optional[int] = None,
+) -> CommentPage:
+    """
+    Возвращает страницу комментариев к новости, начиная после cursor.
+
+    Порядок совпадает с Comment.Meta.ordering, id добавлен для
+    однозначности при совпадающем времени создания.
+    """
+    per_page = per_page or settings.COMMENTS_COUNT_ON_DETAIL_PAGE
+    comments = Comment.objects.filter(news=news).select_related(
+        'author'
+    ).order_by('created', 'pk')
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        # Условие на created >= позволяет начать просмотр индекса сразу
+        # с нужного места, а не фильтровать все предыдущие строки.
+        comments = comments.filter(
+            Q(created__gte=created)
+            & (Q(created__gt=created) | Q(pk__gt=pk))
+        )
+    # Берём на один комментарий больше, чтобы узнать, есть ли продолжение.
+    comments = list(comments[:per_page + 1])
+    if len(comments) <= per_page:
+        return CommentPage(comments, None)
+    last_shown = comments[per_page - 1]
+    return CommentPage(comments[:per_page], encode_cursor(last_shown))
@@ -1,28 +1,145 @@
 from datetime import datetime
-from pathlib import Path, PosixPath
 from random import randint
-from typing import Dict, Iterable, List
-import json
+from time import sleep
+from typing import Callable, Dict, Iterable, List
+import re
 
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import OperationalError, connection, connections
+from django.test.utils import CaptureQueriesContext
 from django.test import Client
 import pytest
 
 from news.forms import BAD_WORDS
 from news.models import Comment, News
+from news.seeding import seed_fixture_news
 
+LOCK_RETRIES: int = 1000
+# «database is locked» или «database table is locked: …» в общей
+# кэш-памяти SQLite, которую использует тестовая база в памяти.
+# Если заблокированы служебные таблицы FTS5, SQLite сообщает
+# «vtable constructor failed: <таблица индекса>».
+LOCK_ERROR = re.compile(
+    r'database (table )?is locked|vtable constructor failed'
+)
 
-def get_json_path() -> str:
+
+@pytest.fixture(autouse=True)
+def clear_cache(settings):
+    """
+    Clear page cache after every test.
+
+    Database rollback between tests doesn't send post_delete signals,
+    so cached pages would outlive the data they were rendered from.
+    """
+    yield
+    caches[settings.NEWS_CACHE_ALIAS].clear()
+
+
+@pytest.fixture
+def sync_replica() -> Callable[[], None]:
     """
-    Search news.json in news directory (and its subdirs).
+    Return a function copying primary test database into replica.
 
-    Return cleaned full path of the first match.
+    Stands in for replication: between calls replica lags behind.
+    Needs a transactional test with both databases enabled.
     """
-    origin_path: Iterable[PosixPath] = Path(
-        __file__
-    ).parent.parent.resolve().glob('**/news.json')
-    path: str = str(origin_path.__next__())
-    return path
+    def sync() -> None:
+        primary, replica = connections['default'], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    return sync
+
+
+@pytest.fixture
+def read_sqlite_pragmas(tmp_path) -> Callable[..., Dict[str, object]]:
+    """
+    Return a function reading PRAGMA values a new connection gets.
+
+    WAL mode needs a database file, and the test database is in memory,
+    so a copy of the connection is opened on a file in tmp_path.
+    """
+    def read(names: Iterable[str]) -> Dict[str, object]:
+        file_connection = connection.copy()
+        file_connection.settings_dict = {
+            **connection.settings_dict, 'NAME': str(tmp_path / 'db.sqlite3')
+        }
+        pragmas = {}
+        try:
+            with file_connection.cursor() as cursor:
+                for name in names:
+                    cursor.execute(f'PRAGMA {name}')
+                    pragmas[name] = cursor.fetchone()[0]
+        finally:
+            file_connection.close()
+        return pragmas
+
+    return read
+
+
+@pytest.fixture
+def retry_locked() -> Callable[[Callable], object]:
+    """
+    Return a function running action and retrying SQLite lock errors.
+
+    SQLite test database doesn't wait for locks held by other
+    connections, so retry like a busy handler would. Other errors
+    are raised at once, and the lock error too after LOCK_RETRIES
+    attempts.
+    """
+    def retry(action: Callable):
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return action()
+            except OperationalError as error:
+                if not LOCK_ERROR.search(str(error)) or (
+                    attempt == LOCK_RETRIES - 1
+                ):
+                    raise
+                sleep(0.01)
+
+    return retry
+
+
+@pytest.fixture
+def assert_query_budget(settings) -> Callable[..., None]:
+    """
+    Return a checker of the number of queries a request makes.
+
+    assert_query_budget(budget, make_request, add_data) counts
+    the queries of make_request(), calls add_data() to seed much more
+    data and counts again. The count must fit into budget and must not
+    grow with data size, which is how N+1 queries show up.
+    Page cache is cleared before each count, so pages are rendered
+    from the database.
+    """
+    def count(make_request: Callable[[], object]) -> int:
+        caches[settings.NEWS_CACHE_ALIAS].clear()
+        with CaptureQueriesContext(connection) as queries:
+            make_request()
+        return len(queries)
+
+    def check(
+        budget: int,
+        make_request: Callable[[], object],
+        add_data: Callable[[], object],
+    ) -> None:
+        small: int = count(make_request)
+        add_data()
+        large: int = count(make_request)
+        assert large == small, (
+            'Убедитесь, что число запросов не растёт с объёмом данных: '
+            f'было {small}, стало {large}.'
+        )
+        assert large <= budget, (
+            f'Убедитесь, что страница укладывается в {budget} запросов, '
+            f'а не делает {large}.'
+        )
+
+    return check
 
 
 @pytest.fixture
@@ -77,12 +194,14 @@ def comment(author: User, news: News) -> Comment:
 @pytest.mark.usefixtures('db')
 def posts_for_pagination() -> List[News]:
     """
-    Create News objects from JSON and return list of it
+    Create News objects from JSON with one query and return list of it.
+
+    The news are added to the search index like seed_news does.
+    The JSON is parsed once per session by news.seeding, but the news
+    are created per test: other tests count the news on the home page
+    and must not see these.
     """
-    json_path = get_json_path()
-    with open(json_path) as news_fixture:
-        news_dict: List[Dict[str, Dict[str, str]]] = json.load(news_fixture)
-    return [News.objects.create(**news['fields']) for news in news_dict]
+    return seed_fixture_news()
 
 
 @pytest.fixture
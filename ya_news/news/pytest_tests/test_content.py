@@ -1,14 +1,28 @@
-from typing import List
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+import re
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
 from django.http.response import HttpResponseBase
-from django.test import Client
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import urlencode
 from _pytest.mark.structures import MarkDecorator
 import pytest
 
+from news.cache import get_cache, home_page_key
+from news.metrics import registry
+from news.middleware import PIN_COOKIE
 from news.forms import CommentForm
 from news.models import News, Comment
+from news.seeding import seed_synthetic
 
 
 HOME_PAGE_URL_NAME: str = 'news:home'
@@ -47,6 +61,65 @@ def test_news_sorting_on_mainpage(
     )
 
 
+def test_comments_count_on_mainpage(
+    anonim_client: Client,
+    news: News,
+    comments_for_post: List[Comment],
+):
+    url: str = reverse(HOME_PAGE_URL_NAME)
+    response: HttpResponseBase = anonim_client.get(url)
+    news_on_page: News = next(
+        post for post in response.context['object_list'] if post == news
+    )
+    assert news_on_page.comment_count == len(comments_for_post), (
+        'Убедитесь, что на главной странице для каждой новости '
+        'выводится количество её комментариев.'
+    )
+
+
+def test_home_page_cache_invalidation(
+    anonim_client: Client,
+    news: News,
+    author: User,
+    django_assert_num_queries,
+):
+    url: str = reverse(HOME_PAGE_URL_NAME)
+    anonim_client.get(url)
+    # Единственный запрос — ETag страницы.
+    with django_assert_num_queries(1):
+        cached_response: HttpResponseBase = anonim_client.get(url)
+    Comment.objects.create(news=news, author=author, text='Текст')
+    response: HttpResponseBase = anonim_client.get(url)
+    assert response.content != cached_response.content, (
+        'Убедитесь, что кэш главной страницы сбрасывается '
+        'при добавлении комментария.'
+    )
+    news_on_page: News = response.context['object_list'][0]
+    assert news_on_page.comment_count == 1, (
+        'Убедитесь, что после сброса кэша главная страница '
+        'показывает актуальное количество комментариев.'
+    )
+
+
+def test_home_page_rebuilds_once(
+    anonim_client: Client,
+    news: News,
+    django_assert_num_queries,
+):
+    url: str = reverse(HOME_PAGE_URL_NAME)
+    anonim_client.get(url)
+    News.objects.create(title='Свежая новость', text='Текст')
+    # Другой воркер уже пересобирает страницу.
+    get_cache().add(f'{home_page_key()}:lock', True)
+    # Единственный запрос — ETag страницы.
+    with django_assert_num_queries(1):
+        response: HttpResponseBase = anonim_client.get(url)
+    assert news.title.encode() in response.content, (
+        'Убедитесь, что пока страница пересобирается другим воркером, '
+        'отдаётся её предыдущая версия из кэша.'
+    )
+
+
 @pytest.mark.usefixtures('comments_for_post')
 def test_comments_sorting(anonim_client: Client, news: News):
     url: str = reverse('news:detail', args=(news.id,))
@@ -62,6 +135,162 @@ def test_comments_sorting(anonim_client: Client, news: News):
     )
 
 
+def test_comments_pagination(
+    anonim_client: Client,
+    news: News,
+    comments_for_post: List[Comment],
+    settings,
+):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 3
+    url: str = reverse('news:comments', args=(news.id,))
+    expected_ids: List[int] = [
+        comment.id
+        for comment in sorted(
+            comments_for_post,
+            key=lambda comment_obj: (comment_obj.created, comment_obj.id)
+        )
+    ]
+    received_ids: List[int] = []
+    params = {'format': 'json'}
+    while True:
+        page = anonim_client.get(url, params).json()
+        page_size: int = len(page['comments'])
+        assert page_size <= settings.COMMENTS_COUNT_ON_DETAIL_PAGE, (
+            'Убедитесь, что на странице выводится не больше '
+            'COMMENTS_COUNT_ON_DETAIL_PAGE комментариев.'
+        )
+        received_ids += [comment['id'] for comment in page['comments']]
+        if page['next_cursor'] is None:
+            break
+        params['after'] = page['next_cursor']
+    assert received_ids == expected_ids, (
+        'Убедитесь, что постраничный вывод комментариев показывает '
+        'каждый комментарий ровно один раз, от старых к новым.'
+    )
+
+
+def test_comments_order_on_rendered_pages(
+    anonim_client: Client,
+    news: News,
+    author: User,
+    settings,
+):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 3
+    # Сколько дней назад создан каждый комментарий: порядок по времени
+    # не совпадает с порядком id, а у двух комментариев время одно.
+    days_ago: List[int] = [5, 1, 3, 3, 0, 4, 2]
+    now: datetime = timezone.now()
+    comments: List[Comment] = []
+    for number, days in enumerate(days_ago):
+        comment = Comment.objects.create(
+            news=news, author=author, text=f'Комментарий №{number}'
+        )
+        # update(), а не save(): у поля created стоит auto_now_add.
+        Comment.objects.filter(pk=comment.pk).update(
+            created=now - timedelta(days=days)
+        )
+        comments.append(comment)
+    expected: List[str] = [
+        comment.text for _, _, comment in sorted(
+            (-days, comment.id, comment)
+            for days, comment in zip(days_ago, comments)
+        )
+    ]
+    received: List[str] = []
+    url: Optional[str] = reverse('news:detail', args=(news.id,))
+    while url is not None:
+        content: str = anonim_client.get(url).content.decode()
+        page: List[str] = re.findall(r'Комментарий №\d+', content)
+        assert len(page) == min(
+            settings.COMMENTS_COUNT_ON_DETAIL_PAGE,
+            len(expected) - len(received)
+        ), (
+            'Убедитесь, что на странице новости выводится '
+            'COMMENTS_COUNT_ON_DETAIL_PAGE комментариев, '
+            'пока они не закончатся.'
+        )
+        received += page
+        next_page = re.search(r'href="([^"#]*\?after=[^"#]*)', content)
+        url = next_page and next_page.group(1)
+    assert received == expected, (
+        'Убедитесь, что комментарии на странице новости и на следующих '
+        'страницах идут от старых к новым, а при одинаковом времени '
+        'создания — по порядку добавления.'
+    )
+
+
+def test_comments_next_page_link(
+    anonim_client: Client,
+    news: News,
+    comments_for_post: List[Comment],
+    settings,
+):
+    settings.COMMENTS_COUNT_ON_DETAIL_PAGE = 5
+    url: str = reverse('news:detail', args=(news.id,))
+    response: HttpResponseBase = anonim_client.get(url)
+    content: str = response.content.decode()
+    assert f'{url}?after=' in content, (
+        'Убедитесь, что на странице новости есть ссылка '
+        'на следующую страницу комментариев.'
+    )
+    assert content.count('Текст комментария') == 5, (
+        'Убедитесь, что на странице новости выводится не больше '
+        'COMMENTS_COUNT_ON_DETAIL_PAGE комментариев.'
+    )
+
+
+def test_comments_page_with_bad_cursor(anonim_client: Client, news: News):
+    url: str = reverse('news:detail', args=(news.id,))
+    response: HttpResponseBase = anonim_client.get(url, {'after': '!!!'})
+    assert response.status_code == HTTPStatus.NOT_FOUND, (
+        'Убедитесь, что некорректный курсор страницы комментариев '
+        'приводит к ошибке 404.'
+    )
+
+
+def test_comment_controls_only_for_author(
+    comment: Comment,
+    author_client: Client,
+    admin_client: Client,
+):
+    url: str = reverse('news:detail', args=(comment.news.id,))
+    edit_url: str = reverse('news:edit', args=(comment.id,))
+    admin_client.get(url)
+    # Второй запрос автора берёт список комментариев из кэша.
+    author_response: HttpResponseBase = author_client.get(url)
+    admin_response: HttpResponseBase = admin_client.get(url)
+    assert edit_url in author_response.content.decode(), (
+        'Убедитесь, что автор видит ссылки управления своим комментарием.'
+    )
+    assert edit_url not in admin_response.content.decode(), (
+        'Убедитесь, что другие пользователи не видят ссылки '
+        'управления чужим комментарием.'
+    )
+
+
+def test_comments_fragment_invalidation(
+    comment: Comment,
+    author_client: Client,
+):
+    url: str = reverse('news:detail', args=(comment.news.id,))
+    new_text: str = 'Исправленный комментарий'
+    author_client.get(url)
+    author_client.post(
+        reverse('news:edit', args=(comment.id,)), data={'text': new_text}
+    )
+    response: HttpResponseBase = author_client.get(url)
+    assert new_text in response.content.decode(), (
+        'Убедитесь, что после редактирования комментария '
+        'список комментариев на странице новости обновляется.'
+    )
+    author_client.post(reverse('news:delete', args=(comment.id,)))
+    response = author_client.get(url)
+    assert new_text not in response.content.decode(), (
+        'Убедитесь, что после удаления комментария '
+        'он пропадает со страницы новости.'
+    )
+
+
 def test_page_contains_comment_form_for_auth_user(
     news: News,
     author_client: Client,
@@ -89,3 +318,274 @@ def test_page_not_contain_comment_form_for_anonim(
         'Убедитесь, что форма для создания комментария '
         'не отображается неавторизованному пользователю'
     )
+
+
+def test_search_finds_news_and_comments(
+    news: News,
+    comment: Comment,
+    anonim_client: Client,
+):
+    title_match: News = News.objects.create(
+        title='Комментарий дня', text='Текст'
+    )
+    url: str = reverse('news:search')
+    response: HttpResponseBase = anonim_client.get(url, {'q': 'коммент'})
+    assert list(response.context['object_list']) == [title_match, news], (
+        'Убедитесь, что поиск находит новости по заголовку и по тексту '
+        'комментариев, а совпадения в заголовке стоят выше.'
+    )
+    assert '<mark>комментария</mark>' in response.content.decode(), (
+        'Убедитесь, что в результатах поиска подсвечиваются совпадения.'
+    )
+
+
+@pytest.mark.usefixtures('posts_for_pagination')
+def test_search_finds_pagination_posts(anonim_client: Client):
+    url: str = reverse('news:search')
+    response: HttpResponseBase = anonim_client.get(url, {'q': 'рекурсию'})
+    assert [
+        news.title for news in response.context['object_list']
+    ] == ['Приз за рекурсию'], (
+        'Убедитесь, что новости из фикстуры попадают в поисковый индекс.'
+    )
+
+
+def test_search_without_fts(
+    news: News,
+    comment: Comment,
+    anonim_client: Client,
+):
+    title_match: News = News.objects.create(
+        title='Пирог дня', text='Текст'
+    )
+    url: str = reverse('news:search')
+    with mock.patch('news.search.is_available', return_value=False):
+        by_title = anonim_client.get(url, {'q': 'пирог'})
+        by_comment = anonim_client.get(url, {'q': comment.text.upper()})
+    assert list(by_title.context['object_list']) == [title_match], (
+        'Убедитесь, что поиск без FTS5 не учитывает регистр и в кириллице.'
+    )
+    assert list(by_comment.context['object_list']) == [news], (
+        'Убедитесь, что поиск без FTS5 находит новости по тексту '
+        'комментариев.'
+    )
+
+
+def test_home_page_conditional_get(
+    news: News,
+    comment: Comment,
+    anonim_client: Client,
+    author_client: Client,
+):
+    url: str = reverse(HOME_PAGE_URL_NAME)
+    etag: str = anonim_client.get(url)['ETag']
+    # Другой процесс со своим кэшем в памяти.
+    get_cache().clear()
+    response: HttpResponseBase = anonim_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+        'Убедитесь, что неизменившаяся главная страница отдаётся с кодом 304 '
+        'и в процессе с другим кэшем.'
+    )
+
+    def edit_news() -> None:
+        news.title = 'Исправленный заголовок'
+        news.save()
+
+    for action, make_change in (
+        ('добавления новости', lambda: News.objects.create(
+            title='Свежая новость', text='Текст'
+        )),
+        ('изменения новости', edit_news),
+        ('удаления комментария', lambda: author_client.post(
+            reverse('news:delete', args=(comment.id,))
+        )),
+    ):
+        make_change()
+        get_cache().clear()
+        response = anonim_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Убедитесь, что после {action} главная страница '
+            'отдаётся заново.'
+        )
+        etag = response['ETag']
+
+
+def test_news_detail_conditional_get(
+    news: News,
+    comment: Comment,
+    author_client: Client,
+    comment_form_data: Dict[str, str],
+):
+    url: str = reverse('news:detail', args=(news.id,))
+    etag: str = author_client.get(url)['ETag']
+    response: HttpResponseBase = author_client.get(
+        url, HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+        'Убедитесь, что неизменившаяся страница новости '
+        'отдаётся с кодом 304.'
+    )
+    assert not response.content, (
+        'Убедитесь, что ответ 304 отдаётся без тела страницы.'
+    )
+
+    def edit_news() -> None:
+        news.title = 'Исправленный заголовок'
+        news.save()
+
+    for action, make_change in (
+        ('изменения новости', edit_news),
+        ('добавления комментария', lambda: author_client.post(
+            url, comment_form_data
+        )),
+        ('редактирования комментария', lambda: author_client.post(
+            reverse('news:edit', args=(comment.id,)),
+            {'text': 'Исправленный комментарий'}
+        )),
+        ('удаления комментария', lambda: author_client.post(
+            reverse('news:delete', args=(comment.id,))
+        )),
+    ):
+        make_change()
+        response = author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Убедитесь, что после {action} страница новости '
+            'отдаётся заново.'
+        )
+        etag = response['ETag']
+
+
+def async_request(
+    client: AsyncClient, method: str, *args, **kwargs
+) -> HttpResponseBase:
+    """
+    Make a request with AsyncClient from a sync test.
+
+    Views reach the database through sync_to_async, which under
+    async_to_sync runs in this thread and sees the test transaction.
+    """
+    async def request() -> HttpResponseBase:
+        return await getattr(client, method)(*args, **kwargs)
+
+    return async_to_sync(request)()
+
+
+@pytest.mark.usefixtures('comment')
+@pytest.mark.parametrize('url_name', (HOME_PAGE_URL_NAME, 'news:detail'))
+def test_asgi_matches_wsgi(
+    url_name: str, news: News, anonim_client: Client
+):
+    args = () if url_name == HOME_PAGE_URL_NAME else (news.id,)
+    url: str = reverse(url_name, args=args)
+    asgi_response: HttpResponseBase = async_request(
+        AsyncClient(), 'get', url
+    )
+    wsgi_response: HttpResponseBase = anonim_client.get(url)
+    assert (asgi_response.status_code, asgi_response.content) == (
+        wsgi_response.status_code, wsgi_response.content
+    ), 'Убедитесь, что под ASGI страница отдаётся та же, что под WSGI.'
+
+
+def test_asgi_news_detail_accepts_comment(
+    news: News, author: User, comment_form_data: Dict[str, str]
+):
+    client = AsyncClient()
+    client.force_login(author)
+    url: str = reverse('news:detail', args=(news.id,))
+    # Multipart-формы AsyncClient в Django 3.2 отправляет с ошибкой.
+    response: HttpResponseBase = async_request(
+        client,
+        'post',
+        url,
+        data=urlencode(comment_form_data),
+        content_type='application/x-www-form-urlencoded',
+    )
+    assert response.status_code == HTTPStatus.FOUND, (
+        'Убедитесь, что под ASGI страница новости принимает комментарий.'
+    )
+    assert PIN_COOKIE in response.cookies, (
+        'Убедитесь, что под ASGI после записи чтение закрепляется '
+        'за основной базой.'
+    )
+    response = async_request(client, 'get', url)
+    assert comment_form_data['text'] in response.content.decode(), (
+        'Убедитесь, что под ASGI новый комментарий виден '
+        'на странице новости.'
+    )
+
+
+@pytest.mark.usefixtures('comments_for_post')
+def test_server_timing_counts_queries(news: News, author_client: Client):
+    url: str = reverse('news:detail', args=(news.id,))
+    with CaptureQueriesContext(connection) as queries:
+        response: HttpResponseBase = author_client.get(url)
+    timings: Dict[str, str] = {
+        metric.split(';')[0]: metric
+        for metric in response['Server-Timing'].split(', ')
+    }
+    assert set(timings) == {'db', 'template', 'total'}, (
+        'Убедитесь, что в Server-Timing есть время базы, '
+        'шаблона и полное время ответа.'
+    )
+    assert f'desc="{len(queries)} queries"' in timings['db'], (
+        'Убедитесь, что Server-Timing показывает все SQL-запросы ответа.'
+    )
+
+
+@pytest.mark.usefixtures('news')
+def test_metrics_histograms(anonim_client: Client, admin_client: Client):
+    registry.clear()
+    for _ in range(3):
+        anonim_client.get(reverse(HOME_PAGE_URL_NAME))
+    response: HttpResponseBase = admin_client.get(reverse('news:metrics'))
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4'), (
+        'Убедитесь, что метрики отдаются в текстовом формате Prometheus.'
+    )
+    lines: List[str] = response.content.decode().splitlines()
+    for name in ('view_duration_seconds', 'view_db_seconds',
+                 'view_template_seconds', 'view_queries'):
+        assert f'# TYPE {name} histogram' in lines, (
+            f'Убедитесь, что метрики содержат гистограмму {name}.'
+        )
+        assert f'{name}_count{{view="news:home"}} 3' in lines, (
+            'Убедитесь, что гистограммы учитывают каждый запрос '
+            'к представлению.'
+        )
+
+
+# Сколько запросов может сделать страница: (имя url, пользователь).
+QUERY_BUDGETS: Dict[Tuple[str, str], int] = {
+    (HOME_PAGE_URL_NAME, 'аноним'): 2,
+    (HOME_PAGE_URL_NAME, 'автор'): 4,
+    ('news:detail', 'аноним'): 3,
+    ('news:detail', 'автор'): 5,
+}
+
+
+@pytest.mark.parametrize('url_name, user', tuple(QUERY_BUDGETS))
+def test_query_budget(
+    url_name: str,
+    user: str,
+    news: News,
+    author: User,
+    anonim_client: Client,
+    author_client: Client,
+    assert_query_budget,
+):
+    Comment.objects.create(news=news, author=author, text='Комментарий')
+    client: Client = {'аноним': anonim_client, 'автор': author_client}[user]
+    args = () if url_name == HOME_PAGE_URL_NAME else (news.id,)
+    url: str = reverse(url_name, args=args)
+
+    def add_data() -> None:
+        seed_synthetic(settings.NEWS_COUNT_ON_HOME_PAGE * 2, 10, author)
+        Comment.objects.bulk_create(
+            Comment(news=news, author=author, text=f'Комментарий {number}')
+            for number in range(settings.COMMENTS_COUNT_ON_DETAIL_PAGE * 2)
+        )
+
+    assert_query_budget(
+        QUERY_BUDGETS[(url_name, user)], lambda: client.get(url), add_data
+    )
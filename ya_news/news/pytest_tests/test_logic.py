@@ -1,15 +1,31 @@
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from typing import Dict, List
+from io import StringIO
+from pathlib import Path
+from threading import Barrier
+from typing import Callable, Dict, List
+import json
+import os
 
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.http.response import HttpResponseBase
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 import pytest
 from pytest_django.asserts import assertFormError, assertRedirects
 
-from news.models import Comment, News
-from news.forms import WARNING
+from news.cache import get_cache, home_page_key
+from news.middleware import PIN_COOKIE
+from news.models import Comment, News, VersionConflict
+from news import search
+from news.search import search_news
+from news.seeding import seed_synthetic
+from news.forms import BAD_WORDS, WARNING, CommentForm
+from news.moderation import WordFilter, get_word_filter
 
 pytestmark = pytest.mark.django_db
 
@@ -85,6 +101,72 @@ def test_cancel_comment_with_bad_words(
     )
 
 
+@pytest.mark.parametrize(
+    'engine',
+    ('news.moderation.RegexFilter', 'news.moderation.AhoCorasickFilter'),
+    ids=['regex', 'aho_corasick']
+)
+def test_bad_words_engines(
+    engine: str,
+    bad_comment_form_data: List[Dict[str, str]],
+    comment_form_data: Dict[str, str],
+    settings,
+):
+    settings.NEWS_BAD_WORDS_ENGINE = engine
+    for bad_data in bad_comment_form_data:
+        assert not CommentForm(data=bad_data).is_valid(), (
+            f'Убедитесь, что движок {engine} находит слова '
+            'из news.forms.BAD_WORDS.'
+        )
+    assert CommentForm(data=comment_form_data).is_valid(), (
+        f'Убедитесь, что движок {engine} пропускает комментарии '
+        'без запрещённых слов.'
+    )
+
+
+@pytest.mark.parametrize(
+    'text',
+    ('Ты pедиcкa!', 'Ты р.е.д.и.с.к.а!', 'Ты р е д и с к а!',
+     'Ты НЕГОДЯЙ!', 'Не будь редиской.', 'С негодяями не спорю.'),
+    ids=['homoglyphs', 'dots', 'spaces', 'upper', 'instrumental', 'plural']
+)
+def test_obfuscated_bad_words(text: str):
+    assert not CommentForm(data={'text': text}).is_valid(), (
+        'Убедитесь, что слова из news.forms.BAD_WORDS находятся '
+        'после замены букв, разбивки знаками и в других формах.'
+    )
+
+
+def test_word_filter_compiled_once(settings):
+    word_filter: WordFilter = get_word_filter(BAD_WORDS)
+    assert get_word_filter(BAD_WORDS) is word_filter, (
+        'Убедитесь, что словарь компилируется один раз, '
+        'а не при каждой проверке комментария.'
+    )
+    settings.NEWS_BAD_WORDS_ENGINE = 'news.moderation.AhoCorasickFilter'
+    assert get_word_filter(BAD_WORDS) is not word_filter, (
+        'Убедитесь, что при смене движка словарь компилируется заново.'
+    )
+    with pytest.raises(TypeError):
+        WordFilter(BAD_WORDS)
+
+
+def test_bad_words_file_reload(tmp_path: Path, settings):
+    dictionary: Path = tmp_path / 'bad_words.txt'
+    dictionary.write_text('брокколи\n', encoding='utf-8')
+    os.utime(dictionary, ns=(1, 1))
+    settings.NEWS_BAD_WORDS_FILE = dictionary
+    form_data: Dict[str, str] = {'text': 'Ты кабачок!'}
+    assert CommentForm(data=form_data).is_valid(), (
+        'Убедитесь, что комментарии проверяются по файлу-словарю.'
+    )
+    dictionary.write_text('брокколи\nкабачок\n', encoding='utf-8')
+    os.utime(dictionary, ns=(2, 2))
+    assert not CommentForm(data=form_data).is_valid(), (
+        'Убедитесь, что файл-словарь перечитывается после изменения.'
+    )
+
+
 def test_author_can_delete_comment(
     comment: Comment,
     news: News,
@@ -150,6 +232,99 @@ def test_author_can_edit_comment(
     )
 
 
+def test_edit_comment_conflict(
+    comment: Comment,
+    author_client: Client,
+    comment_form_data: Dict[str, str],
+):
+    url: str = reverse('news:edit', args=(comment.id,))
+    stale_version: int = author_client.get(url).context[
+        'form'
+    ]['version'].value()
+    concurrent_edit: Comment = Comment.objects.get(pk=comment.id)
+    concurrent_edit.text = 'Правка из другой вкладки'
+    concurrent_edit.save()
+    response: HttpResponseBase = author_client.post(
+        url, data={**comment_form_data, 'version': stale_version}
+    )
+    assert response.status_code == HTTPStatus.CONFLICT, (
+        'Убедитесь, что правка устаревшей версии комментария '
+        'возвращает код 409.'
+    )
+    assert Comment.objects.get(pk=comment.id).text == concurrent_edit.text, (
+        'Убедитесь, что правка устаревшей версии не затирает комментарий.'
+    )
+    assert concurrent_edit.text in response.content.decode(), (
+        'Убедитесь, что при конфликте пользователю '
+        'показывается текущий текст комментария.'
+    )
+    response = author_client.post(
+        url, data={
+            **comment_form_data,
+            'version': response.context['form']['version'].value(),
+        }
+    )
+    assert response.status_code == HTTPStatus.FOUND, (
+        'Убедитесь, что после конфликта правку можно сохранить повторно.'
+    )
+    assert Comment.objects.get(pk=comment.id).text == (
+        comment_form_data['text']
+    ), 'Убедитесь, что повторная правка сохраняется.'
+
+
+def run_editors(edit, editors: int) -> list:
+    def run(number: int):
+        try:
+            return edit(number)
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=editors) as pool:
+        return list(pool.map(run, range(editors)))
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_comment_edits(
+    author: User, news: News, retry_locked: Callable
+):
+    editors: int = 8
+    edits_per_editor: int = 5
+    comment: Comment = Comment.objects.create(
+        news=news, author=author, text='0'
+    )
+    barrier = Barrier(editors, timeout=5)
+
+    def load() -> Comment:
+        return retry_locked(lambda: Comment.objects.get(pk=comment.pk))
+
+    def edit(number: int) -> int:
+        conflicts: int = 0
+        barrier.wait()
+        for _ in range(edits_per_editor):
+            saved = False
+            while not saved:
+                current: Comment = load()
+                current.text = str(int(current.text) + 1)
+                try:
+                    retry_locked(
+                        lambda: current.save_if_version(current.version)
+                    )
+                    saved = True
+                except VersionConflict:
+                    conflicts += 1
+        return conflicts
+
+    run_editors(edit, editors)
+    total_edits: int = editors * edits_per_editor
+    comment = load()
+    assert (int(comment.text), comment.version) == (
+        total_edits, total_edits + 1
+    ), (
+        'Убедитесь, что при одновременных правках с повтором '
+        'после конфликта ни одна правка комментария не теряется.'
+    )
+
+
 def test_another_user_cant_delete_comment(
     comment: Comment,
     comment_form_data: Dict[str, str],
@@ -193,3 +368,248 @@ def test_another_user_cant_edit_comment(
         'Убедитесь, что news_id комментария '
         'совпадает с таковым до обновления.'
     )
+
+
+def test_import_comments(
+    news: News,
+    author: User,
+    tmp_path: Path,
+):
+    rows: List[Dict[str, str]] = [
+        {'news': news.id, 'author': author.username,
+         'text': f'Архивный комментарий {number}',
+         'created': f'2020-01-0{number + 1}T12:00:00+00:00'}
+        for number in range(3)
+    ] + [
+        {'news': news.id, 'author': author.username,
+         'text': f'Ты {BAD_WORDS[0]}'},
+        {'news': news.id, 'author': 'Неизвестный', 'text': 'Текст'},
+        ['не', 'объект'],
+        {'news': news.id, 'author': author.username, 'text': 'Текст',
+         'created': '2020-13-45T00:00:00'},
+        {'news': news.id, 'author': author.username, 'text': 'Текст',
+         'created': 'вчера'},
+    ]
+    archive: Path = tmp_path / 'comments.jsonl'
+    archive.write_text(
+        '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows),
+        encoding='utf-8'
+    )
+    stdout = StringIO()
+    call_command('import_comments', archive, batch_size=2, stdout=stdout)
+    assert 'отклонено фильтром: 1, пропущено: 4.' in stdout.getvalue(), (
+        'Убедитесь, что import_comments пропускает строки, которые '
+        'не являются объектом или содержат неверную дату.'
+    )
+    imported = list(Comment.objects.filter(news=news))
+    assert [comment.text for comment in imported] == [
+        row['text'] for row in rows[:3]
+    ], (
+        'Убедитесь, что import_comments импортирует только комментарии '
+        'известных авторов без запрещённых слов.'
+    )
+    assert imported[0].created.year == 2020, (
+        'Убедитесь, что import_comments сохраняет дату создания из архива.'
+    )
+    assert Comment._meta.get_field('created').auto_now_add, (
+        'Убедитесь, что import_comments не отключает auto_now_add '
+        'у поля created.'
+    )
+    assert search_news('Архивный', 10) == [news], (
+        'Убедитесь, что import_comments добавляет комментарии '
+        'в поисковый индекс.'
+    )
+
+
+def test_import_comments_stops_on_bad_line(
+    news: News,
+    author: User,
+    anonim_client: Client,
+    tmp_path: Path,
+):
+    anonim_client.get(reverse('news:home'))
+    archive: Path = tmp_path / 'comments.jsonl'
+    archive.write_text(
+        json.dumps({'news': news.id, 'author': author.username,
+                    'text': 'Архивный комментарий'}, ensure_ascii=False)
+        + '\n{не json\n',
+        encoding='utf-8'
+    )
+    with pytest.raises(CommandError):
+        call_command('import_comments', archive, batch_size=1)
+    assert search_news('Архивный', 10) == [news], (
+        'Убедитесь, что комментарии, вставленные до ошибки в файле, '
+        'попадают в поисковый индекс.'
+    )
+    assert get_cache().get(home_page_key()) is None, (
+        'Убедитесь, что после импорта с ошибкой главная страница '
+        'не отдаётся из устаревшего кэша.'
+    )
+
+
+def test_search_index_check_is_cached(news: News, author: User):
+    search.is_available(connection)
+    with CaptureQueriesContext(connection) as queries:
+        Comment.objects.create(news=news, author=author, text='Текст')
+        search_news('Текст', 10)
+    assert not [
+        query for query in queries if 'sqlite_master' in query['sql']
+    ], (
+        'Убедитесь, что наличие поискового индекса проверяется '
+        'один раз, а не при каждом сохранении и поиске.'
+    )
+
+
+@pytest.mark.usefixtures('comment')
+def test_export_news_round_trip(tmp_path: Path, admin_client: Client):
+    dump: Path = tmp_path / 'news.jsonl'
+    call_command('export_news', output=dump)
+    expected_news = list(News.objects.values())
+    expected_comments = list(Comment.objects.values())
+    response = admin_client.get(reverse('news:export'))
+    assert b''.join(response.streaming_content).decode() == dump.read_text(
+        encoding='utf-8'
+    ), 'Убедитесь, что news:export отдаёт ту же выгрузку, что export_news.'
+    stdout = StringIO()
+    call_command('export_news', stdout=stdout)
+    assert stdout.getvalue() == dump.read_text(encoding='utf-8'), (
+        'Убедитесь, что export_news без --output пишет выгрузку '
+        'в self.stdout команды.'
+    )
+    News.objects.all().delete()
+    call_command('loaddata', dump, verbosity=0)
+    assert list(News.objects.values()) == expected_news, (
+        'Убедитесь, что выгрузка export_news загружается через loaddata.'
+    )
+    assert list(Comment.objects.values()) == expected_comments, (
+        'Убедитесь, что выгрузка export_news содержит комментарии.'
+    )
+
+
+def test_seed_synthetic(author: User):
+    seed_synthetic(news_count=3, comments_per_news=4, author=author)
+    assert News.objects.count() == 3, (
+        'Убедитесь, что seed_synthetic создаёт заданное число новостей.'
+    )
+    assert all(
+        news.comment_set.count() == 4 for news in News.objects.all()
+    ), (
+        'Убедитесь, что seed_synthetic создаёт заданное число '
+        'комментариев к каждой новости.'
+    )
+
+
+def test_search_index_follows_changes(
+    news: News,
+    comment: Comment,
+    author_client: Client,
+):
+    author_client.post(
+        reverse('news:edit', args=(comment.id,)),
+        data={'text': 'Совсем другое мнение'}
+    )
+    assert search_news('мнение', 10) == [news], (
+        'Убедитесь, что поисковый индекс обновляется '
+        'при редактировании комментария.'
+    )
+    assert search_news('комментария', 10) == [], (
+        'Убедитесь, что старый текст комментария пропадает из поиска.'
+    )
+    news.delete()
+    assert search_news('мнение', 10) == [], (
+        'Убедитесь, что удалённые новости и их комментарии '
+        'пропадают из поиска.'
+    )
+
+
+def test_search_index_after_bulk_changes(author: User):
+    seed_synthetic(news_count=2, comments_per_news=2, author=author)
+    assert len(search_news('Комментарий', 10)) == 2, (
+        'Убедитесь, что seed_synthetic добавляет в поисковый индекс '
+        'созданные в обход сигналов комментарии.'
+    )
+    Comment.objects.update(text='Обновлено')
+    call_command('rebuild_search_index', stdout=StringIO())
+    assert search_news('Комментарий', 10) == [], (
+        'Убедитесь, что rebuild_search_index перестраивает индекс.'
+    )
+    assert len(search_news('Обновлено', 10)) == 2, (
+        'Убедитесь, что rebuild_search_index индексирует комментарии.'
+    )
+
+
+def test_production_sqlite_pragmas(settings, read_sqlite_pragmas):
+    settings.SQLITE_PRAGMAS = settings.SQLITE_PRODUCTION_PRAGMAS
+    pragmas = read_sqlite_pragmas(settings.SQLITE_PRAGMAS)
+    assert pragmas == {
+        'journal_mode': 'wal',
+        'synchronous': 1,
+        'busy_timeout': 5000,
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+    }, (
+        'Убедитесь, что в профиле production новое соединение '
+        'с SQLite получает PRAGMA из SQLITE_PRODUCTION_PRAGMAS.'
+    )
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_reads_follow_own_writes_to_primary(
+    settings,
+    news: News,
+    author_client: Client,
+    comment_form_data: Dict[str, str],
+    sync_replica,
+):
+    settings.DATABASE_REPLICAS = ['replica']
+    sync_replica()
+    old_title: str = news.title
+    # Реплика отстаёт: изменения видны только в основной базе.
+    News.objects.filter(pk=news.pk).update(title='Новый заголовок')
+    url: str = reverse('news:detail', args=(news.id,))
+    assert author_client.get(url).context['object'].title == old_title, (
+        'Убедитесь, что страница новости читается из реплики.'
+    )
+    response: HttpResponseBase = author_client.post(
+        url, data=comment_form_data
+    )
+    assert PIN_COOKIE in response.cookies, (
+        'Убедитесь, что после записи чтение закрепляется '
+        'за основной базой.'
+    )
+    response = author_client.get(url)
+    assert response.context['object'].title == 'Новый заголовок', (
+        'Убедитесь, что после записи пользователь читает '
+        'из основной базы.'
+    )
+    assert comment_form_data['text'] in response.content.decode(), (
+        'Убедитесь, что после перенаправления пользователь '
+        'видит свой комментарий.'
+    )
+    assert Client().get(url).context['object'].title == old_title, (
+        'Убедитесь, что другие пользователи по-прежнему '
+        'читают из реплики.'
+    )
+
+
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_shared_cache_filled_from_primary(
+    settings,
+    news: News,
+    author_client: Client,
+    comment_form_data: Dict[str, str],
+    sync_replica,
+):
+    settings.DATABASE_REPLICAS = ['replica']
+    sync_replica()
+    url: str = reverse('news:detail', args=(news.id,))
+    author_client.post(url, data=comment_form_data)
+    # Посетитель без закрепления открывает страницу раньше автора,
+    # пока комментария в реплике ещё нет.
+    Client().get(url)
+    assert comment_form_data['text'] in author_client.get(
+        url
+    ).content.decode(), (
+        'Убедитесь, что кэш комментариев заполняется из основной базы '
+        'и автор видит свой комментарий.'
+    )
@@ -0,0 +1,72 @@
+from typing import List
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+import pytest
+
+from news.models import Comment, News
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != 'sqlite',
+        reason='Проверяются планы запросов SQLite.'
+    ),
+]
+
+
+def get_query_plans(client: Client, url: str, table: str) -> List[str]:
+    """
+    Request url and return EXPLAIN QUERY PLAN of every query
+    that reads from the given table.
+    """
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    plans = []
+    with connection.cursor() as cursor:
+        for query in context.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            if f'FROM "{table}"' not in query['sql']:
+                continue
+            cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+            plans.append(' '.join(row[-1] for row in cursor.fetchall()))
+    return plans
+
+
+@pytest.mark.usefixtures('posts_for_pagination')
+def test_news_list_uses_indexes(anonim_client: Client):
+    plans = get_query_plans(
+        anonim_client, reverse('news:home'), News._meta.db_table
+    )
+    assert plans, 'Не найден запрос списка новостей.'
+    for plan in plans:
+        assert 'news_date_idx' in plan, (
+            'Убедитесь, что список новостей читается по индексу '
+            f'news_date_idx. План запроса: {plan}'
+        )
+        assert 'comment_news_created_idx' in plan, (
+            'Убедитесь, что количество комментариев считается по индексу '
+            f'comment_news_created_idx. План запроса: {plan}'
+        )
+
+
+@pytest.mark.usefixtures('comments_for_post')
+def test_news_detail_uses_indexes(anonim_client: Client, news: News):
+    plans = get_query_plans(
+        anonim_client,
+        reverse('news:detail', args=(news.id,)),
+        Comment._meta.db_table,
+    )
+    assert plans, 'Не найден запрос комментариев к новости.'
+    for plan in plans:
+        assert 'comment_news_created_idx' in plan, (
+            'Убедитесь, что комментарии к новости читаются по индексу '
+            f'comment_news_created_idx. План запроса: {plan}'
+        )
+        assert 'TEMP B-TREE' not in plan, (
+            'Убедитесь, что для сортировки комментариев не требуется '
+            f'временная таблица. План запроса: {plan}'
+        )
@@ -26,6 +26,8 @@ from news.models import Comment, News
          (('аноним', HTTPStatus.OK),)),
         ('news:detail', pytest.lazy_fixture('news'),
          (('аноним', HTTPStatus.OK),)),
+        ('news:comments', pytest.lazy_fixture('news'),
+         (('аноним', HTTPStatus.OK),)),
         ('news:edit', pytest.lazy_fixture('news'),
          (('аноним', HTTPStatus.FOUND),
           ('авторизованный', HTTPStatus.NOT_FOUND),
@@ -34,9 +36,20 @@ from news.models import Comment, News
          (('аноним', HTTPStatus.FOUND),
           ('авторизованный', HTTPStatus.NOT_FOUND),
           ('автор', HTTPStatus.OK))),
+        ('news:search', None,
+         (('аноним', HTTPStatus.OK),)),
+        ('news:export', None,
+         (('аноним', HTTPStatus.FOUND),
+          ('авторизованный', HTTPStatus.OK),
+          ('автор', HTTPStatus.FORBIDDEN))),
+        ('news:metrics', None,
+         (('аноним', HTTPStatus.FOUND),
+          ('авторизованный', HTTPStatus.OK),
+          ('автор', HTTPStatus.FORBIDDEN))),
     ],
     ids=['home', 'login', 'logout', 'signup', 'news_detail',
-         'news_edit', 'news_delete']
+         'news_comments', 'news_edit', 'news_delete', 'news_search',
+         'news_export', 'news_metrics']
 )
 def test_pages_availability(
     url_name: str,
@@ -0,0 +1,345 @@
+"""
+Полнотекстовый поиск по новостям и комментариям.
+
+На SQLite с модулем FTS5 поиск идёт по виртуальной таблице
+news_search_fts. В ней по строке на каждую новость (заголовок и текст)
+и на каждый комментарий (только текст); rowid строки кодирует
+её источник, поэтому строку можно заменить или удалить без поиска
+по таблице. Индекс обновляется сигналами при сохранении и удалении
+новостей и комментариев, целиком перестраивается командой
+rebuild_search_index.
+
+bulk_create сигналов не отправляет: после массовой вставки
+нужно вызвать index_new с наибольшими id до вставки.
+
+Есть ли индекс в базе, проверяется по sqlite_master один раз на базу.
+Ответ сбрасывают install, uninstall и сигнал post_migrate. SQL индекса
+копируется в миграции, а не импортируется отсюда: миграции не должны
+меняться вместе с модулем.
+
+Если FTS5 недоступен или база не SQLite, поиск откатывается
+к поиску подстроки в новостях и комментариях без учёта регистра.
+"""
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.db import OperationalError, connections, router
+from django.db.models import Exists, OuterRef, Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Comment, News
+
+FTS_TABLE = 'news_search_fts'
+SNIPPET_WORDS = 16
+PUNCTUATION = '.,:;!?«»"\'()[]—-…'
+# Совпадение в заголовке весит втрое больше, чем в тексте.
+RANK = 'bm25(3.0, 1.0, 0.0)'
+# Сколько последних совпавших строк ранжируется. bm25 считается
+# для каждой строки, и без окна частые слова в миллионах комментариев
+# ранжировались бы сотни миллисекунд.
+SEARCH_WINDOW = 1000
+# Сколько новостей читать за раз при поиске без FTS5 на SQLite.
+FALLBACK_CHUNK_SIZE = 500
+
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, text, news_id UNINDEXED,
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+NEWS_ROWS = '''
+    SELECT id * 2, title, text, id FROM news_news WHERE id > %s
+'''
+COMMENT_ROWS = '''
+    SELECT id * 2 + 1, '', text, news_id FROM news_comment WHERE id > %s
+'''
+# Есть ли индекс: по псевдониму и имени базы (см. is_available).
+INDEX_AVAILABLE: Dict[Tuple[str, str], bool] = {}
+
+
+def last_pk(model) -> int:
+    """Наибольший id модели: с него index_new продолжит после вставки."""
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    ).first() or 0
+
+
+def news_rowid(pk: int) -> int:
+    return pk * 2
+
+
+def comment_rowid(pk: int) -> int:
+    return pk * 2 + 1
+
+
+def install(connection) -> None:
+    """Создаёт индекс и заполняет его текущими новостями и комментариями."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_TABLE)
+        except OperationalError:
+            # SQLite собран без FTS5: поиск будет работать без индекса.
+            return
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES (%s, %s)',
+            ['rank', RANK]
+        )
+    forget_availability()
+    rebuild(connection)
+
+
+def uninstall(connection) -> None:
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    forget_availability()
+
+
+def is_available(connection) -> bool:
+    """
+    Есть ли в базе индекс.
+
+    sqlite_master читается один раз на базу: иначе каждое сохранение
+    новости или комментария стоило бы лишнего запроса.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    key = (connection.alias, str(connection.settings_dict['NAME']))
+    if key not in INDEX_AVAILABLE:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = %s",
+                [FTS_TABLE]
+            )
+            INDEX_AVAILABLE[key] = cursor.fetchone() is not None
+    return INDEX_AVAILABLE[key]
+
+
+def forget_availability() -> None:
+    """Сбрасывает ответы is_available: индекс создан или удалён."""
+    INDEX_AVAILABLE.clear()
+
+
+def rebuild(connection) -> None:
+    """Перестраивает индекс с нуля."""
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    index_new(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"
+        )
+
+
+def index_new(connection, news_after: int = 0,
+              comments_after: int = 0) -> None:
+    """
+    Индексирует новости и комментарии с id больше заданных.
+
+    Уже проиндексированные строки заменяются, так что вызывать
+    с запасом безопасно.
+    """
+    if not is_available(connection):
+        return
+    with connection.cursor() as cursor:
+        for rows, after in (
+            (NEWS_ROWS, news_after), (COMMENT_ROWS, comments_after)
+        ):
+            cursor.execute(
+                f'INSERT OR REPLACE INTO {FTS_TABLE}'
+                f'(rowid, title, text, news_id) {rows}',
+                [after]
+            )
+
+
+def index_object(connection, instance) -> None:
+    """Добавляет или заменяет в индексе новость или комментарий."""
+    if not is_available(connection):
+        return
+    if isinstance(instance, News):
+        row = [news_rowid(instance.pk), instance.title, instance.text,
+               instance.pk]
+    else:
+        row = [comment_rowid(instance.pk), '', instance.text,
+               instance.news_id]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE}'
+            '(rowid, title, text, news_id) VALUES (%s, %s, %s, %s)',
+            row
+        )
+
+
+def unindex_object(connection, instance) -> None:
+    """
+    Удаляет из индекса новость или комментарий.
+
+    Комментарии удалённой новости удаляются каскадом, и для каждого
+    из них приходит свой сигнал.
+    """
+    if not is_available(connection):
+        return
+    if isinstance(instance, News):
+        rowid = news_rowid(instance.pk)
+    else:
+        rowid = comment_rowid(instance.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+
+
+def to_fts_query(query: str) -> str:
+    """
+    Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово ищется как префикс, все слова должны встретиться
+    в одной новости или в одном комментарии.
+    """
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def make_snippet(text: str, words: List[str]) -> str:
+    """
+    Фрагмент text вокруг первого совпадения с подсвеченными словами.
+
+    snippet() из FTS5 для префиксных запросов заново разворачивает
+    префиксы по всему индексу, поэтому фрагмент собирается в Python.
+    """
+    prefixes = tuple(word.lower() for word in words)
+    tokens = text.split()
+    matches = [
+        token.strip(PUNCTUATION).lower().startswith(prefixes)
+        for token in tokens
+    ]
+    first = matches.index(True) if True in matches else 0
+    start = max(0, first - SNIPPET_WORDS // 4)
+    window = slice(start, start + SNIPPET_WORDS)
+    parts = [
+        f'<mark>{escape(token)}</mark>' if matched else escape(token)
+        for token, matched in zip(tokens[window], matches[window])
+    ]
+    if start > 0:
+        parts.insert(0, '…')
+    if start + SNIPPET_WORDS < len(tokens):
+        parts.append('…')
+    return mark_safe(' '.join(parts))
+
+
+def search_news(query: str, limit: int,
+                using: Optional[str] = None) -> List[News]:
+    """
+    Ищет query в новостях и комментариях к ним.
+
+    Возвращает не больше limit новостей, самые релевантные первыми;
+    релевантность новости — лучшая из релевантностей её строк.
+    Ранжируются только SEARCH_WINDOW самых новых совпавших строк.
+    У каждой новости есть атрибут snippet — фрагмент лучшей строки
+    с подсвеченными совпадениями.
+    """
+    if not query.split():
+        return []
+    using = using or router.db_for_read(News)
+    connection = connections[using]
+    if not is_available(connection):
+        return fallback_search(query, limit, using)
+    fts_query = to_fts_query(query)
+    with connection.cursor() as cursor:
+        # При единственном min() SQLite берёт rowid из строки с минимумом.
+        cursor.execute(
+            f'''
+            SELECT rowid, news_id, min(rank) AS best
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s AND rowid >= coalesce((
+                SELECT rowid FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH %s
+                ORDER BY rowid DESC
+                LIMIT 1 OFFSET %s
+            ), 0)
+            GROUP BY news_id
+            ORDER BY best
+            LIMIT %s
+            ''',
+            [fts_query, fts_query, SEARCH_WINDOW, limit]
+        )
+        best_rows = {
+            rowid: news_id for rowid, news_id, _ in cursor.fetchall()
+        }
+        texts = dict(fetch_texts(cursor, best_rows))
+    news = News.objects.using(using).in_bulk(best_rows.values())
+    results = []
+    for rowid, news_id in best_rows.items():
+        if news_id in news:
+            news[news_id].snippet = make_snippet(
+                texts.get(rowid, ''), query.split()
+            )
+            results.append(news[news_id])
+    return results
+
+
+def fetch_texts(cursor, rowids: Iterable[int]):
+    rowids = list(rowids)
+    if not rowids:
+        return []
+    placeholders = ', '.join(['%s'] * len(rowids))
+    cursor.execute(
+        f'SELECT rowid, text FROM {FTS_TABLE} '
+        f'WHERE rowid IN ({placeholders})',
+        rowids
+    )
+    return cursor.fetchall()
+
+
+def fallback_search(query: str, limit: int,
+                    using: str = 'default') -> List[News]:
+    """
+    Поиск подстроки query без FTS5.
+
+    LIKE и lower() в SQLite без ICU приводят к нижнему регистру только
+    латиницу: icontains по «пирог» не нашёл бы «Пирог». Поэтому
+    на SQLite регистр сравнивается в Python.
+    """
+    if connections[using].vendor == 'sqlite':
+        news = list(islice(matching_news(query.casefold(), using), limit))
+    else:
+        comments = Comment.objects.using(using).filter(
+            news=OuterRef('pk'), text__icontains=query
+        )
+        news = list(News.objects.using(using).filter(
+            Q(title__icontains=query)
+            | Q(text__icontains=query)
+            | Exists(comments)
+        )[:limit])
+    for item in news:
+        item.snippet = Truncator(item.text).words(SNIPPET_WORDS)
+    return news
+
+
+def matching_news(needle: str, using: str) -> Iterator[News]:
+    """
+    Новости, в заголовке, тексте или комментариях которых есть needle.
+
+    Новости читаются порциями по FALLBACK_CHUNK_SIZE, комментарии —
+    одним запросом на порцию.
+    """
+    news = News.objects.using(using).iterator(FALLBACK_CHUNK_SIZE)
+    for chunk in iter(lambda: list(islice(news, FALLBACK_CHUNK_SIZE)), []):
+        commented = {
+            news_id for news_id, text in Comment.objects.using(using).filter(
+                news__in=chunk
+            ).values_list('news_id', 'text')
+            if needle in text.casefold()
+        }
+        for item in chunk:
+            if item.pk in commented or needle in item.title.casefold() or (
+                needle in item.text.casefold()
+            ):
+                yield item
@@ -0,0 +1,95 @@
+"""
+Быстрое наполнение базы новостями и комментариями.
+
+Используется фикстурами тестов, бенчмарками и командой seed_news.
+Все объекты вставляются через bulk_create порциями, поэтому даже
+миллионы комментариев не требуют держать их в памяти целиком.
+"""
+import json
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+from django.contrib.auth import get_user_model
+from django.db import connection, models, transaction
+
+from . import search
+from .models import Comment, News
+
+FIXTURE_PATH = Path(__file__).resolve().parent / 'fixtures' / 'news.json'
+BATCH_SIZE = 1000
+
+User = get_user_model()
+
+
+@lru_cache(maxsize=None)
+def load_news_fixture(
+    path: Path = FIXTURE_PATH
+) -> Tuple[Dict[str, str], ...]:
+    """Поля новостей из фикстуры; файл читается один раз за процесс."""
+    with open(path, encoding='utf-8') as fixture:
+        return tuple(
+            entry['fields'] for entry in json.load(fixture)
+            if entry['model'] == News._meta.label_lower
+        )
+
+
+def bulk_create(
+    model: Type[models.Model],
+    objects: Iterable[models.Model],
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """bulk_create для генератора: в памяти не больше batch_size объектов."""
+    objects = iter(objects)
+    created = 0
+    for batch in iter(lambda: list(islice(objects, batch_size)), []):
+        model.objects.bulk_create(batch)
+        created += len(batch)
+    return created
+
+
+def seed_fixture_news(path: Path = FIXTURE_PATH) -> List[News]:
+    news_after = search.last_pk(News)
+    news = News.objects.bulk_create(
+        News(**fields) for fields in load_news_fixture(path)
+    )
+    search.index_new(connection, news_after, search.last_pk(Comment))
+    return news
+
+
+@transaction.atomic
+def seed_synthetic(
+    news_count: int,
+    comments_per_news: int,
+    author: Optional[models.Model] = None,
+) -> None:
+    """Создаёт news_count новостей по comments_per_news комментариев."""
+    if author is None:
+        author, _ = User.objects.get_or_create(username='seed')
+    news_after = search.last_pk(News)
+    comments_after = search.last_pk(Comment)
+    today = date.today()
+    bulk_create(News, (
+        News(
+            title=f'Новость {number}',
+            text=f'Текст новости {number}',
+            date=today - timedelta(days=number),
+        )
+        for number in range(news_count)
+    ))
+    # SQLite не возвращает id из bulk_create, поэтому читаем их отдельно.
+    news_ids = News.objects.order_by('-pk').values_list(
+        'pk', flat=True
+    )[:news_count]
+    bulk_create(Comment, (
+        Comment(
+            news_id=news_id,
+            author=author,
+            text=f'Комментарий {number}',
+        )
+        for news_id in news_ids
+        for number in range(comments_per_news)
+    ))
+    search.index_new(connection, news_after, comments_after)
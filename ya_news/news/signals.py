@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from . import metrics, search
+from .cache import invalidate_comments, invalidate_home_page
+from .models import Comment, News
+
+
+@receiver((post_save, post_delete), sender=News)
+@receiver((post_save, post_delete), sender=Comment)
+def reset_home_page(**kwargs):
+    """Главная страница зависит от новостей и числа комментариев к ним."""
+    invalidate_home_page()
+
+
+@receiver((post_save, post_delete), sender=Comment)
+def reset_comments(instance, **kwargs):
+    """Сбрасывает кэш комментариев новости."""
+    invalidate_comments(instance.news_id)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_save, sender=Comment)
+def index_for_search(instance, using, **kwargs):
+    search.index_object(connections[using], instance)
+
+
+@receiver(post_delete, sender=News)
+@receiver(post_delete, sender=Comment)
+def unindex_for_search(instance, using, **kwargs):
+    search.unindex_object(connections[using], instance)
+
+
+@receiver(connection_created)
+def configure_sqlite(connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS на новом соединении с SQLite."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def record_queries(connection, **kwargs):
+    """Учитывает запросы соединения в метриках текущего запроса."""
+    if metrics.record_query not in connection.execute_wrappers:
+        # В начало: execute_wrapper() снимает с конца списка свою обёртку.
+        connection.execute_wrappers.insert(0, metrics.record_query)
+
+
+@receiver(post_migrate)
+def reset_search_availability(**kwargs):
+    # Миграции могли создать или удалить поисковый индекс.
+    search.forget_availability()
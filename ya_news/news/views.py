@@ -1,13 +1,99 @@
+import hashlib
+from http import HTTPStatus
+
 from django.conf import settings
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin, UserPassesTestMixin
+)
+from django.db import transaction
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.http import (
+    HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
 from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.http import urlencode
 from django.views import generic
+from django.views.decorators.http import condition
+
+from .cache import (
+    HOME_PAGE_STALE_KEY, add_comment_controls, cached_page,
+    comments_fragment_key, get_cache, home_page_key
+)
+from .export import iter_lines
+from .forms import CONFLICT, CommentForm
+from .metrics import CONTENT_TYPE, registry
+from .models import Comment, News, VersionConflict
+from .pagination import get_comments_page
+from .routers import primary_reads
+from .search import search_news
+
+
+def comment_aggregate(aggregate):
+    """
+    Агрегат по комментариям новости как коррелированный подзапрос.
+
+    Считается только для выбранных новостей: тексты комментариев
+    в память не загружаются, а с LIMIT подзапрос выполняется лишь
+    для попавших в выборку строк.
+    """
+    return Subquery(
+        Comment.objects.filter(news=OuterRef('pk')).order_by().values(
+            'news'
+        ).annotate(value=aggregate).values('value')
+    )
+
+
+def home_page_etag(request, *args, **kwargs):
+    """
+    Версия главной страницы одним запросом: поля новостей с главной,
+    число комментариев к каждой, время последнего и сумма их версий.
+
+    Как и у news_detail_etag, состояние берётся из базы, а не из
+    счётчика в кэше: у locmem счётчик свой в каждом процессе, и воркер,
+    не видевший изменения, ответил бы 304 на устаревшую страницу.
+    """
+    state = list(News.objects.annotate(
+        comments=comment_aggregate(Count('pk')),
+        last_comment=comment_aggregate(Max('created')),
+        comment_versions=comment_aggregate(Sum('version')),
+    ).values_list(
+        'pk', 'title', 'text', 'date',
+        'comments', 'last_comment', 'comment_versions',
+    )[:settings.NEWS_COUNT_ON_HOME_PAGE])
+    digest = hashlib.md5(repr(state).encode()).hexdigest()
+    return f'home-{request.user.pk}-{digest}'
 
-from .forms import CommentForm
-from .models import Comment, News
 
+def news_detail_etag(request, pk):
+    """
+    Версия страницы новости одним запросом: поля новости, число
+    комментариев, время последнего и сумма их версий (редактирование
+    комментария увеличивает версию).
 
+    Состояние берётся из базы, а не из счётчика в кэше, поэтому ETag
+    одинаков во всех процессах и с locmem. Last-Modified не отдаём:
+    удаление и редактирование комментария не сдвигают времени
+    последнего изменения по базе.
+    """
+    state = News.objects.filter(pk=pk).annotate(
+        comments=comment_aggregate(Count('pk')),
+        last_comment=comment_aggregate(Max('created')),
+        comment_versions=comment_aggregate(Sum('version')),
+    ).values_list(
+        'title', 'text', 'date',
+        'comments', 'last_comment', 'comment_versions',
+    ).first()
+    if state is None:
+        return None
+    digest = hashlib.md5(repr(state).encode()).hexdigest()
+    return f'news-{pk}-{request.user.pk}-{digest}'
+
+
+@method_decorator(condition(etag_func=home_page_etag), name='get')
 class NewsList(generic.ListView):
     """Список новостей."""
     model = News
@@ -18,22 +104,83 @@ class NewsList(generic.ListView):
         Выводим только несколько последних новостей.
 
         Их количество определяется в настройках проекта.
+        Количество комментариев считается коррелированным подзапросом
+        в том же запросе, что и сами новости: тексты комментариев
+        в память не загружаются.
         """
-        return self.model.objects.prefetch_related(
-            'comment_set'
+        return self.model.objects.annotate(
+            comment_count=Coalesce(comment_aggregate(Count('pk')), 0)
         )[:settings.NEWS_COUNT_ON_HOME_PAGE]
 
+    def get(self, request, *args, **kwargs):
+        """Анонимным пользователям отдаём страницу из кэша."""
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+        return cached_page(
+            home_page_key(),
+            lambda: super(NewsList, self).get(request, *args, **kwargs),
+            stale_key=HOME_PAGE_STALE_KEY,
+        )
 
-class NewsDetail(generic.DetailView):
+
+class CommentPageMixin:
+    """
+    Добавляет в контекст одну страницу комментариев к новости.
+
+    Страница рендерится без учёта текущего пользователя и кэшируется
+    по версии комментариев новости; ссылки на редактирование и удаление
+    своих комментариев подставляются в готовый HTML.
+    """
     model = News
-    template_name = 'news/detail.html'
+    next_page_url_name = None
+    next_page_anchor = ''
 
     def get_object(self, queryset=None):
-        obj = get_object_or_404(
-            self.model.objects.prefetch_related('comment_set__author'),
-            pk=self.kwargs['pk']
+        return get_object_or_404(self.model, pk=self.kwargs['pk'])
+
+    def get_comments_page(self):
+        return get_comments_page(self.object, self.request.GET.get('after'))
+
+    def render_comments(self):
+        page = self.get_comments_page()
+        next_page_url = None
+        if page.next_cursor:
+            next_page_url = '{}?{}{}'.format(
+                reverse(self.next_page_url_name, args=(self.object.pk,)),
+                urlencode({'after': page.next_cursor}),
+                self.next_page_anchor,
+            )
+        return render_to_string('includes/comments.html', {
+            'comments': page.comments,
+            'next_page_url': next_page_url,
+        })
+
+    def get_comments_html(self):
+        key = comments_fragment_key(
+            self.object.pk,
+            self.next_page_url_name,
+            self.request.GET.get('after'),
         )
-        return obj
+        fragment = get_cache().get(key)
+        if fragment is None:
+            # Фрагмент увидят все: читаем его из основной базы,
+            # а не из отстающей реплики.
+            with primary_reads():
+                fragment = self.render_comments()
+            get_cache().set(key, fragment, settings.NEWS_PAGE_CACHE_TIMEOUT)
+        return add_comment_controls(fragment, self.request.user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['comments_html'] = self.get_comments_html()
+        return context
+
+
+@method_decorator(condition(etag_func=news_detail_etag), name='get')
+class NewsDetail(CommentPageMixin, generic.DetailView):
+    template_name = 'news/detail.html'
+    next_page_url_name = 'news:detail'
+    next_page_anchor = '#comments'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -42,12 +189,42 @@ class NewsDetail(generic.DetailView):
         return context
 
 
+class NewsComments(CommentPageMixin, generic.View):
+    """
+    Следующая страница комментариев для подгрузки на странице новости.
+
+    По умолчанию отдаёт HTML-фрагмент, с параметром format=json — JSON.
+    """
+    next_page_url_name = 'news:comments'
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if request.GET.get('format') != 'json':
+            return HttpResponse(self.get_comments_html())
+        page = self.get_comments_page()
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': str(comment.author),
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in page.comments
+            ],
+            'next_cursor': page.next_cursor,
+        })
+
+
 class NewsComment(
         LoginRequiredMixin,
+        CommentPageMixin,
         generic.detail.SingleObjectMixin,
         generic.FormView
 ):
     model = News
+    next_page_url_name = 'news:detail'
+    next_page_anchor = '#comments'
     form_class = CommentForm
     template_name = 'news/detail.html'
 
@@ -94,11 +271,79 @@ class CommentBase(LoginRequiredMixin):
 
 
 class CommentUpdate(CommentBase, generic.UpdateView):
-    """Редактирование комментария."""
+    """
+    Редактирование комментария.
+
+    Если комментарий изменили после того, как пользователь открыл
+    форму, отвечаем 409: форма с его правкой и текущий текст,
+    чтобы он мог их объединить.
+    """
     template_name = 'news/edit.html'
     form_class = CommentForm
 
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        expected = form.cleaned_data['version'] or self.object.version
+        try:
+            # Точка сохранения: конфликт не должен ломать внешнюю
+            # транзакцию, если она есть.
+            with transaction.atomic():
+                self.object.save_if_version(expected)
+        except VersionConflict:
+            return self.conflict(form)
+        return HttpResponseRedirect(self.get_success_url())
+
+    def conflict(self, form):
+        self.object = self.get_object()
+        form.data = form.data.copy()
+        form.data['version'] = self.object.version
+        form.add_error(None, CONFLICT)
+        return self.render_to_response(
+            self.get_context_data(form=form, current=self.object),
+            status=HTTPStatus.CONFLICT,
+        )
+
 
 class CommentDelete(CommentBase, generic.DeleteView):
     """Удаление комментария."""
     template_name = 'news/delete.html'
+
+
+class NewsSearch(generic.ListView):
+    """Поиск по новостям и комментариям к ним."""
+    template_name = 'news/search.html'
+
+    def get_queryset(self):
+        return search_news(
+            self.request.GET.get('q', ''),
+            settings.NEWS_COUNT_ON_SEARCH_PAGE,
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+class NewsExport(UserPassesTestMixin, generic.View):
+    """Потоковая выгрузка новостей с комментариями (только для персонала)."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(
+            iter_lines(), content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = 'attachment; filename="news.jsonl"'
+        return response
+
+
+class Metrics(UserPassesTestMixin, generic.View):
+    """Метрики представлений в формате Prometheus (только для персонала)."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -1,5 +1,7 @@
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,6 +23,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'news.middleware.InstrumentationMiddleware',
+    'news.middleware.PinPrimaryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +55,17 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yanews.wsgi.application'
 
 
+# Профиль базы данных задаётся переменной окружения DATABASE_PROFILE:
+# development — настройки SQLite по умолчанию, production — WAL,
+# постоянные соединения и PRAGMA из SQLITE_PRODUCTION_PRAGMAS.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+DATABASE_PROFILES = ('development', 'production')
+if DATABASE_PROFILE not in DATABASE_PROFILES:
+    raise ImproperlyConfigured(
+        f'DATABASE_PROFILE должен быть одним из {DATABASE_PROFILES}, '
+        f'а не {DATABASE_PROFILE!r}.'
+    )
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
@@ -58,6 +73,40 @@ DATABASES = {
     }
 }
 
+# PRAGMA, которые выполняются на каждом новом соединении с SQLite.
+SQLITE_PRAGMAS = {}
+SQLITE_PRODUCTION_PRAGMAS = {
+    # Читатели не ждут писателя, а писатель — читателей.
+    'journal_mode': 'WAL',
+    # В режиме WAL база не повреждается и без fsync на каждый коммит.
+    'synchronous': 'NORMAL',
+    # Сколько миллисекунд ждать блокировку, прежде чем
+    # вернуть «database is locked».
+    'busy_timeout': 5000,
+    # Отрицательное значение — размер в КиБ: 64 МиБ страничного кэша.
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default']['CONN_MAX_AGE'] = 60 * 10
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+
+# Реплика SQLite только для чтения: путь к её файлу задаётся переменной
+# окружения DATABASE_REPLICA, копирование в неё основной базы — забота
+# развёртывания. Без переменной псевдоним replica смотрит в основную
+# базу и чтение из реплик выключено.
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'NAME': os.environ.get('DATABASE_REPLICA', DATABASES['default']['NAME']),
+}
+# Псевдонимы из DATABASES, из которых читаются запросы пользователей.
+DATABASE_REPLICAS = ['replica'] if 'DATABASE_REPLICA' in os.environ else []
+# Сколько секунд после записи пользователь читает из основной базы:
+# больше, чем реплика может отставать.
+DATABASE_REPLICA_PIN_SECONDS = 10
+DATABASE_ROUTERS = ['news.routers.PrimaryReplicaRouter']
+
 
 AUTH_PASSWORD_VALIDATORS = []
 
@@ -80,3 +129,22 @@ LOGIN_URL = reverse_lazy('users:login')
 LOGIN_REDIRECT_URL = reverse_lazy('news:home')
 
 NEWS_COUNT_ON_HOME_PAGE = 10
+
+COMMENTS_COUNT_ON_DETAIL_PAGE = 50
+
+NEWS_COUNT_ON_SEARCH_PAGE = 20
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Псевдоним кэша из CACHES, в котором хранятся страницы новостей.
+NEWS_CACHE_ALIAS = 'default'
+NEWS_PAGE_CACHE_TIMEOUT = 60 * 5
+NEWS_CACHE_LOCK_TIMEOUT = 10
+
+# Движок поиска запрещённых слов и необязательный файл-словарь.
+NEWS_BAD_WORDS_ENGINE = 'news.moderation.RegexFilter'
+NEWS_BAD_WORDS_FILE = None
@@ -0,0 +1,65 @@
+"""
+Бенчмарки YaNote.
+
+Запускаются из каталога ya_note как модули, например:
+
+    python -m benchmarks.slugify_cache
+
+Каждый бенчмарк работает на временной тестовой базе данных,
+рабочая db.sqlite3 не затрагивается.
+"""
+import os
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Callable, Iterator, List, Sequence
+
+import django
+
+
+def setup() -> None:
+    """Настраивает Django для запуска вне manage.py."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yanote.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """Создаёт временную базу данных и удаляет её по выходу из блока."""
+    from django.db import connection
+    from django.test.utils import (
+        setup_test_environment, teardown_test_environment
+    )
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def timeit(func: Callable[[], object], repeat: int = 5) -> float:
+    """Возвращает лучшее время выполнения func в секундах."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        best = min(best, perf_counter() - start)
+    return best
+
+
+def latencies(func: Callable[[], object], requests: int) -> List[float]:
+    """Время каждого из requests вызовов func в секундах."""
+    samples = []
+    for _ in range(requests):
+        start = perf_counter()
+        func()
+        samples.append(perf_counter() - start)
+    return samples
+
+
+def percentile(samples: Sequence[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+    return ordered[index]
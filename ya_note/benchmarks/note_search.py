@@ -0,0 +1,91 @@
+"""
+Задержка поиска по заметкам: индекс FTS5 (notes.search.search_notes)
+против перебора через icontains (notes.search.fallback_search).
+
+Число заметок задаётся первым аргументом, по умолчанию миллион:
+
+    python -m benchmarks.note_search 100000
+"""
+import random
+import sys
+from itertools import accumulate
+
+from benchmarks import latencies, percentile, setup, test_database
+
+NOTES = 1_000_000
+AUTHORS = 10
+BATCH_SIZE = 10_000
+REQUESTS = 50
+VOCABULARY = 20_000
+SYLLABLES = ('ка', 'ро', 'ми', 'ту', 'ле', 'на', 'со', 'пи', 'ва', 'ды')
+
+
+def make_vocabulary(rng: random.Random) -> tuple:
+    """Слова словаря и накопленные частоты по закону Ципфа."""
+    words = sorted({
+        ''.join(rng.choices(SYLLABLES, k=rng.randint(2, 5)))
+        for _ in range(VOCABULARY)
+    })
+    rng.shuffle(words)
+    return words, list(accumulate(
+        1 / rank for rank in range(1, len(words) + 1)
+    ))
+
+
+def seed(notes: int, words: list, weights: list,
+         rng: random.Random) -> None:
+    from django.contrib.auth import get_user_model
+
+    from notes.models import Note
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(username=f'author-{number}') for number in range(AUTHORS)
+    )
+    authors = list(User.objects.values_list('pk', flat=True))
+    for start in range(0, notes, BATCH_SIZE):
+        Note.objects.bulk_create(
+            Note(
+                title=' '.join(rng.choices(words, cum_weights=weights, k=4)),
+                text=' '.join(rng.choices(words, cum_weights=weights, k=40)),
+                slug=f'note-{number}',
+                author_id=rng.choice(authors),
+            )
+            for number in range(start, min(start + BATCH_SIZE, notes))
+        )
+
+
+def report(name: str, samples: list) -> None:
+    print(f'{name:<10} p50 {percentile(samples, 50) * 1000:8.1f} мс, '
+          f'p95 {percentile(samples, 95) * 1000:8.1f} мс')
+
+
+def main(notes: int) -> None:
+    from django.conf import settings
+
+    from notes.models import Note
+    from notes.search import fallback_search, search_notes
+
+    limit = settings.NOTES_COUNT_ON_LIST_PAGE
+    rng = random.Random(0)
+    words, weights = make_vocabulary(rng)
+    seed(notes, words, weights, rng)
+    queryset = Note.objects.filter(author__username='author-0')
+    # Запросы из слов средней частоты: не стоп-слова и не редкости.
+    queries = iter(words[100:100 + REQUESTS])
+    fts = latencies(
+        lambda: search_notes(queryset, next(queries), limit), REQUESTS
+    )
+    queries = iter(words[100:100 + REQUESTS])
+    scan = latencies(
+        lambda: fallback_search(queryset, next(queries), limit), REQUESTS
+    )
+    print(f'Заметок: {notes}, авторов: {AUTHORS}.')
+    report('FTS5', fts)
+    report('icontains', scan)
+
+
+if __name__ == '__main__':
+    setup()
+    with test_database():
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else NOTES)
@@ -0,0 +1,49 @@
+"""
+Скорость pytils.translit.slugify с кэшем notes.slugs.cached_slugify
+и без него на корпусе заголовков с реалистичной повторяемостью:
+частоты заголовков распределены по закону Ципфа.
+"""
+import random
+
+from benchmarks import setup, timeit
+
+TITLES = 200_000
+DISTINCT_TITLES = 5_000
+WORDS = (
+    'список', 'покупок', 'идеи', 'для', 'проекта', 'встреча', 'с',
+    'командой', 'план', 'на', 'неделю', 'заметки', 'по', 'книге',
+    'рецепт', 'пирога', 'отчёт', 'задачи', 'дом', 'работа',
+)
+
+
+def make_corpus(rng: random.Random) -> list:
+    distinct = [
+        ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6)))
+        + f' {number}'
+        for number in range(DISTINCT_TITLES)
+    ]
+    weights = [1 / rank for rank in range(1, DISTINCT_TITLES + 1)]
+    return rng.choices(distinct, weights, k=TITLES)
+
+
+def main() -> None:
+    from pytils.translit import slugify
+
+    from notes.slugs import cached_slugify
+
+    corpus = make_corpus(random.Random(0))
+    plain_time = timeit(lambda: [slugify(title) for title in corpus], 3)
+    cached_slugify.cache_clear()
+    cached_time = timeit(
+        lambda: [cached_slugify(title) for title in corpus], 3
+    )
+    print(f'Заголовков: {TITLES}, различных: {DISTINCT_TITLES}.')
+    print(f'slugify:        {plain_time:.3f} с')
+    print(f'cached_slugify: {cached_time:.3f} с '
+          f'(ускорение в {plain_time / cached_time:.1f} раза)')
+    print(cached_slugify.cache_info())
+
+
+if __name__ == '__main__':
+    setup()
+    main()
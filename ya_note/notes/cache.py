@@ -0,0 +1,74 @@
+"""
+Кэш заметок по пользователю и slug.
+
+Все функции работают с кэшем settings.NOTES_CACHE_ALIAS: срок жизни
+записей и их предельное число задаются в CACHES (TIMEOUT и
+OPTIONS.MAX_ENTRIES), там же выбирается бэкенд — в памяти процесса
+или в файлах.
+
+Ключи заметок содержат номер версии заметок пользователя. Сигналы
+увеличивают его при сохранении и удалении любой заметки пользователя,
+и все его записи разом становятся недоступны; старые истекут сами.
+QuerySet.update и bulk_create сигналов не отправляют: после массовых
+изменений нужно вызвать invalidate_user_notes.
+"""
+from time import time
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+
+from .models import Note
+
+
+def get_cache() -> BaseCache:
+    return caches[settings.NOTES_CACHE_ALIAS]
+
+
+def initial_version() -> int:
+    """
+    Начальное значение счётчика версии.
+
+    Берём текущее время в миллисекундах: если счётчик вытеснят из кэша,
+    новая версия не совпадёт ни с одной из выданных ранее.
+    """
+    return int(time() * 1000)
+
+
+def user_version_key(user_id: int) -> str:
+    return f'notes:user:{user_id}:version'
+
+
+def get_version(key: str) -> Optional[int]:
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_user_notes(user_id: int) -> None:
+    cache = get_cache()
+    key = user_version_key(user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), None)
+
+
+def get_note(user_id: int, slug: str) -> Optional[Note]:
+    """
+    Заметка пользователя по slug: из кэша или из базы.
+
+    Отсутствующие заметки не кэшируются.
+    """
+    cache = get_cache()
+    version = get_version(user_version_key(user_id))
+    key = f'notes:{user_id}:{version}:{slug}'
+    note = cache.get(key) if version is not None else None
+    if note is None:
+        note = Note.objects.filter(author_id=user_id, slug=slug).first()
+        if note is not None and version is not None:
+            cache.set(key, note)
+    return note
@@ -1,27 +1,45 @@
-from pytils.translit import slugify
-
 from django import forms
 from django.core.exceptions import ValidationError
 
 from .models import Note
 
 WARNING = ' - такой slug уже существует, придумайте уникальное значение!'
+CONFLICT = (
+    'Заметку изменили, пока вы её редактировали. Ниже — текущая версия: '
+    'перенесите в форму нужные изменения и сохраните ещё раз.'
+)
 
 
 class NoteForm(forms.ModelForm):
-    """Форма для создания или обновления заметки."""
+    """
+    Форма для создания или обновления заметки.
+
+    Скрытое поле version хранит версию заметки, которую видел
+    пользователь: Note.save_if_version не даст сохранить изменения
+    поверх более новой версии.
+    """
+    version = forms.IntegerField(
+        widget=forms.HiddenInput, required=False, min_value=1
+    )
 
     class Meta:
         model = Note
         fields = ('title', 'text', 'slug')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['version'].initial = self.instance.version
+
     def clean_slug(self):
-        """Обрабатывает случай, если slug не уникален."""
-        cleaned_data = super().clean()
-        slug = cleaned_data.get('slug')
+        """
+        Обрабатывает случай, если slug не уникален.
+
+        Пустой slug подбирает Note.save через notes.slugs.allocate_slug:
+        при совпадении заголовков к нему добавляется суффикс.
+        """
+        slug = self.cleaned_data.get('slug')
         if not slug:
-            title = cleaned_data.get('title')
-            slug = slugify(title)[:100]
+            return slug
         if Note.objects.filter(
                 slug=slug
         ).exclude(id=self.instance.pk).exists():
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from notes.models import Note
+from notes.transfer import FORMATS, export_notes, guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает заметки в JSONL или Markdown в формате, '
+        'который читает import_notes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-o', '--output',
+            help='Файл для выгрузки. По умолчанию — стандартный вывод.'
+        )
+        parser.add_argument(
+            '--author',
+            help='Выгрузить только заметки этого пользователя.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='export_format',
+            help='Формат выгрузки. По умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько заметок читать из базы за один раз.'
+        )
+
+    def handle(self, *args, output, author, export_format, chunk_size,
+               **options):
+        queryset = Note.objects.all()
+        if author is not None:
+            queryset = queryset.filter(author__username=author)
+        export_format = export_format or guess_format(output or '')
+        if output is None:
+            # Записи уже заканчиваются переводом строки.
+            self.stdout.ending = ''
+            export_notes(self.stdout, export_format, queryset, chunk_size)
+            return
+        # newline='': концы строк \r\n в тексте заметок не меняются.
+        with open(
+            output, 'w', encoding='utf-8', newline=''
+        ) as destination:
+            export_notes(destination, export_format, queryset, chunk_size)
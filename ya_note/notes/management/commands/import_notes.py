@@ -0,0 +1,122 @@
+import sys
+from itertools import islice
+from time import perf_counter
+from typing import Dict, List
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from notes.models import SLUG_ALLOCATION_ATTEMPTS, Note
+from notes.slugs import allocate_slugs
+from notes.transfer import FORMATS, READERS, TransferError, guess_format
+
+User = get_user_model()
+TITLE_MAX_LENGTH = Note._meta.get_field('title').max_length
+SLUG_MAX_LENGTH = Note._meta.get_field('slug').max_length
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует заметки пользователя из JSONL (поля title, text и '
+        'необязательный slug) или Markdown (см. notes.transfer).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл для импорта или «-» для стандартного ввода.'
+        )
+        parser.add_argument(
+            '--author', required=True,
+            help='Имя пользователя, которому будут принадлежать заметки.'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS, dest='import_format',
+            help='Формат файла. По умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько заметок вставлять одной транзакцией.'
+        )
+
+    def handle(self, *args, path, author, import_format, batch_size,
+               **options):
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        try:
+            self.author = User.objects.get(username=author)
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь {author} не найден.')
+        read = READERS[import_format or guess_format(path)]
+        self.stats = dict.fromkeys(('imported', 'skipped'), 0)
+        start = perf_counter()
+        # newline='': концы строк \r\n в тексте заметок не меняются.
+        source = sys.stdin if path == '-' else open(
+            path, encoding='utf-8', newline=''
+        )
+        try:
+            rows = read(source)
+            for batch in iter(lambda: list(islice(rows, batch_size)), []):
+                self.import_batch(batch)
+        except TransferError as error:
+            raise CommandError(error)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        elapsed = perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            'Импортировано: {imported}, пропущено: {skipped}.'.format(
+                **self.stats
+            )
+        ))
+        self.stdout.write(
+            f'{self.stats["imported"] / elapsed:.0f} заметок/с '
+            f'за {elapsed:.1f} с.'
+        )
+
+    def import_batch(self, batch: List[Dict]) -> None:
+        """
+        Вставляет пачку одним bulk_create.
+
+        Slug для всей пачки подбираются в памяти по одному запросу.
+        Если параллельно кто-то занял один из них, пачка вставляется
+        заново с новыми slug.
+        """
+        rows = [row for row in batch if self.is_valid(row)]
+        self.stats['skipped'] += len(batch) - len(rows)
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            slugs = allocate_slugs(
+                (row.get('slug') or row['title'] for row in rows),
+                Note.objects.all(),
+                SLUG_MAX_LENGTH,
+            )
+            notes = [
+                Note(
+                    title=row['title'],
+                    text=row['text'],
+                    slug=slug,
+                    author=self.author,
+                )
+                for row, slug in zip(rows, slugs)
+            ]
+            try:
+                with transaction.atomic():
+                    Note.objects.bulk_create(notes)
+            except IntegrityError:
+                if attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+                    raise
+                continue
+            self.stats['imported'] += len(notes)
+            return
+
+    def is_valid(self, row: Dict) -> bool:
+        if not isinstance(row, dict):
+            return False
+        title, text = row.get('title'), row.get('text')
+        return (
+            isinstance(row.get('slug', ''), str)
+            and isinstance(title, str)
+            and 0 < len(title) <= TITLE_MAX_LENGTH
+            and isinstance(text, str)
+            and bool(text)
+        )
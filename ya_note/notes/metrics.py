@@ -0,0 +1,162 @@
+"""
+Метрики запросов: число SQL-запросов, время в базе, время рендеринга
+шаблона и полное время ответа для каждого представления.
+
+Замеры одного запроса копятся в RequestStats из current_stats.
+Middleware InstrumentationMiddleware отдаёт их в заголовке
+Server-Timing и добавляет в гистограммы процесса, а представление
+Metrics выводит гистограммы в текстовом формате Prometheus.
+
+SQL-запросы считает обёртка record_query, которую сигнал
+connection_created ставит на каждое соединение: так учитываются
+запросы ко всем базам, в том числе к репликам.
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+# Имя, описание и границы корзин каждой гистограммы.
+HISTOGRAMS = {
+    'view_duration_seconds': (
+        'Полное время ответа представления.', DURATION_BUCKETS
+    ),
+    'view_db_seconds': (
+        'Время SQL-запросов за один ответ.', DURATION_BUCKETS
+    ),
+    'view_template_seconds': (
+        'Время рендеринга шаблона ответа.', DURATION_BUCKETS
+    ),
+    'view_queries': ('Число SQL-запросов за один ответ.', QUERY_BUCKETS),
+}
+UNRESOLVED_VIEW = '<unresolved>'
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RequestStats:
+    """Замеры одного запроса."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+    @property
+    def duration(self) -> float:
+        return perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing, время в миллисекундах."""
+        return (
+            f'db;desc="{self.queries} queries";'
+            f'dur={self.db_time * 1000:.2f}, '
+            f'template;dur={self.template_time * 1000:.2f}, '
+            f'total;dur={self.duration * 1000:.2f}'
+        )
+
+
+current_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    'request_stats', default=None
+)
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка SQL-запросов: см. connection.execute_wrapper."""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += perf_counter() - start
+
+
+def timed_render(response):
+    """Рендерит TemplateResponse, добавляя время к текущему запросу."""
+    start = perf_counter()
+    response = response.render()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.template_time += perf_counter() - start
+    return response
+
+
+class Histogram:
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # Последняя корзина — +Inf.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы процесса по представлениям."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+
+    def observe(self, view: str, stats: RequestStats) -> None:
+        values = {
+            'view_duration_seconds': stats.duration,
+            'view_db_seconds': stats.db_time,
+            'view_template_seconds': stats.template_time,
+            'view_queries': stats.queries,
+        }
+        with self.lock:
+            for name, value in values.items():
+                key = (name, view)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self.histograms[key].observe(value)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self) -> str:
+        """Гистограммы в текстовом формате Prometheus."""
+        lines: List[str] = []
+        with self.lock:
+            for name, (description, buckets) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(
+                    self.histograms.items()
+                ):
+                    if metric == name:
+                        lines.extend(render_histogram(name, view, histogram))
+        return '\n'.join(lines) + '\n'
+
+
+def render_histogram(name: str, view: str,
+                     histogram: Histogram) -> List[str]:
+    label = 'view="{}"'.format(
+        view.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+    lines = []
+    total = 0
+    for bound, count in zip(
+        (*histogram.buckets, '+Inf'), histogram.counts
+    ):
+        total += count
+        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {total}')
+    lines.append(f'{name}_sum{{{label}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{label}}} {total}')
+    return lines
+
+
+registry = Registry()
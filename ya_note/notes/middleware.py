@@ -0,0 +1,67 @@
+from django.conf import settings
+
+from .metrics import (
+    UNRESOLVED_VIEW, RequestStats, current_stats, registry, timed_render
+)
+from .routers import ReplicaPin, current_pin
+
+PIN_COOKIE = 'pin_primary'
+
+
+class PinPrimaryMiddleware:
+    """
+    Закрепляет чтение за основной базой после записи.
+
+    Должен стоять в MIDDLEWARE раньше SessionMiddleware: сессия
+    сохраняется в ответе, и эта запись тоже должна закрепить чтение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pin = ReplicaPin(pinned=PIN_COOKIE in request.COOKIES)
+        token = current_pin.set(pin)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_pin.reset(token)
+        if pin.wrote:
+            response.set_cookie(
+                PIN_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class InstrumentationMiddleware:
+    """
+    Замеряет каждый запрос: число SQL-запросов, время в базе,
+    время рендеринга шаблона и полное время ответа (см. metrics).
+
+    Замеры уходят в заголовок Server-Timing и в гистограммы процесса.
+    Должен стоять первым в MIDDLEWARE, чтобы учесть время остальных.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        match = request.resolver_match
+        registry.observe(match.view_name if match else UNRESOLVED_VIEW, stats)
+        response['Server-Timing'] = stats.server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        # Вызывается последним перед рендерингом: рендерим сами,
+        # чтобы замерить время.
+        return timed_render(response)
@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from notes.migrations._fts import install_search, uninstall_search
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0002_note_author_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+from notes.migrations._fts import reinstall_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0003_note_search'),
+    ]
+
+    operations = [
+        # Откат AddField тоже пересоздаёт notes_note, поэтому при откате
+        # триггеры создаются последним шагом.
+        migrations.RunPython(migrations.RunPython.noop, reinstall_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Изменена'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['author', 'updated_at'], name='note_author_updated_idx'),
+        ),
+        migrations.RunPython(reinstall_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+from notes.migrations._fts import reinstall_triggers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notes', '0004_note_updated_at'),
+    ]
+
+    operations = [
+        # Откат AddField тоже пересоздаёт notes_note, поэтому при откате
+        # триггеры создаются последним шагом.
+        migrations.RunPython(migrations.RunPython.noop, reinstall_triggers),
+        migrations.AddField(
+            model_name='note',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия'),
+        ),
+        migrations.RunPython(reinstall_triggers, migrations.RunPython.noop),
+    ]
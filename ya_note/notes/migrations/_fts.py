@@ -0,0 +1,92 @@
+"""
+SQL поискового индекса заметок на момент миграции 0003.
+
+Миграции берут SQL отсюда, а не из notes.search: миграции не должны
+меняться вместе с модулем. Если схема индекса изменится, новая
+миграция заводит свою копию. Django не считает модули с подчёркиванием
+в начале имени миграциями.
+"""
+from django.db import OperationalError
+
+FTS_TABLE = 'notes_note_fts'
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, text,
+        content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+TRIGGERS = {
+    'notes_note_fts_insert': f'''
+        AFTER INSERT ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, text)
+            VALUES (new.id, new.title, new.text);
+        END
+    ''',
+    'notes_note_fts_delete': f'''
+        AFTER DELETE ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+            VALUES ('delete', old.id, old.title, old.text);
+        END
+    ''',
+    'notes_note_fts_update': f'''
+        AFTER UPDATE OF title, text ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+            VALUES ('delete', old.id, old.title, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, title, text)
+            VALUES (new.id, new.title, new.text);
+        END
+    ''',
+}
+
+
+def install_search(apps, schema_editor):
+    """Создаёт индекс и триггеры и заполняет индекс заметками."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_TABLE)
+        except OperationalError:
+            # SQLite собран без FTS5: поиск будет работать через icontains.
+            return
+        create_triggers(cursor)
+
+
+def reinstall_triggers(apps, schema_editor):
+    """
+    Заново создаёт триггеры, если индекс есть.
+
+    SQLite пересоздаёт notes_note при добавлении и удалении поля,
+    и триггеры поискового индекса теряются.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        if cursor.fetchone() is None:
+            # Индекса нет: SQLite собран без FTS5.
+            return
+        create_triggers(cursor)
+
+
+def uninstall_search(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def create_triggers(cursor):
+    for name, body in TRIGGERS.items():
+        cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'CREATE TRIGGER {name} {body}')
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
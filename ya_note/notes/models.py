@@ -1,7 +1,15 @@
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.signals import post_save
 
-from pytils.translit import slugify
+from .slugs import allocate_slug
+
+# Сколько раз подбирать slug заново, если его заняли параллельно.
+SLUG_ALLOCATION_ATTEMPTS = 10
+
+
+class VersionConflict(Exception):
+    """Запись изменили после того, как её прочитали."""
 
 
 class Note(models.Model):
@@ -26,13 +34,94 @@ class Note(models.Model):
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        # Выборки по author_id обслуживает составной индекс из Meta.indexes.
+        db_index=False,
     )
+    updated_at = models.DateTimeField('Изменена', auto_now=True)
+    version = models.PositiveIntegerField(
+        'Версия', default=1, editable=False
+    )
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('author', 'id'), name='note_author_id_idx'),
+            # Число заметок и время последнего изменения для ETag списка
+            # считаются по одному этому индексу, без чтения таблицы.
+            models.Index(
+                fields=('author', 'updated_at'),
+                name='note_author_updated_idx'
+            ),
+        )
 
     def __str__(self):
         return self.title
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            max_slug_length = self._meta.get_field('slug').max_length
-            self.slug = slugify(self.title)[:max_slug_length]
-        super().save(*args, **kwargs)
+        # Любая запись меняет версию: формы, открытые до неё,
+        # получат конфликт в save_if_version.
+        if not self._state.adding:
+            self.version += 1
+        self.with_free_slug(lambda: super(Note, self).save(*args, **kwargs))
+
+    def save_if_version(self, expected: int) -> None:
+        """
+        Оптимистическая блокировка: сохраняет заметку, только если
+        в базе всё ещё версия expected.
+
+        Один запрос UPDATE ... WHERE version = expected записывает поля
+        и увеличивает версию. Если версия уже другая, бросает
+        VersionConflict — изменение, сделанное после чтения заметки,
+        не затирается молча. UPDATE не отправляет post_save, поэтому
+        сигнал отправляется здесь: по нему сбрасывается кэш заметок.
+        """
+        using = router.db_for_write(Note, instance=self)
+
+        def update():
+            fields = [
+                field for field in self._meta.local_concrete_fields
+                if not field.primary_key and field.name != 'version'
+            ]
+            updated = Note.objects.using(using).filter(
+                pk=self.pk, version=expected
+            ).update(
+                version=models.F('version') + 1,
+                **{
+                    field.attname: field.pre_save(self, False)
+                    for field in fields
+                }
+            )
+            if not updated:
+                raise VersionConflict
+
+        self.with_free_slug(update)
+        self.version = expected + 1
+        post_save.send(
+            sender=Note, instance=self, created=False,
+            update_fields=None, raw=False, using=using,
+        )
+
+    def with_free_slug(self, write) -> None:
+        """
+        Выполняет запись write, подобрав slug, если он не задан.
+
+        Подобранный slug может занять параллельный запрос: тогда
+        при IntegrityError slug подбирается заново.
+        """
+        if self.slug:
+            return write()
+        max_slug_length = self._meta.get_field('slug').max_length
+        for attempt in range(SLUG_ALLOCATION_ATTEMPTS):
+            self.slug = allocate_slug(
+                self.title,
+                Note.objects.exclude(pk=self.pk),
+                max_slug_length
+            )
+            try:
+                # Точка сохранения позволяет повторить запись, не ломая
+                # внешнюю транзакцию.
+                with transaction.atomic():
+                    return write()
+            except IntegrityError:
+                self.slug = ''
+                if attempt == SLUG_ALLOCATION_ATTEMPTS - 1:
+                    raise
@@ -0,0 +1,64 @@
+"""
+Маршрутизация запросов между основной базой и репликами.
+
+Запись всегда идёт в основную базу default, чтение в запросе
+пользователя — в одну из реплик из DATABASE_REPLICAS. Реплика может
+отставать, поэтому после записи чтение закрепляется за основной базой:
+до конца запроса и ещё на DATABASE_REPLICA_PIN_SECONDS секунд через
+cookie (см. middleware.PinPrimaryMiddleware). Так пользователь сразу
+видит свою заметку после перенаправления на страницу успеха.
+
+Вне запроса (команды manage.py, оболочка, фоновые задачи) всё читается
+из основной базы: там запись и чтение часто идут вперемешку.
+
+Кэш заполняется тем, что прочитано из реплики, поэтому сразу после
+сброса в него может на время отставания реплики попасть старая версия.
+"""
+import random
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+
+PRIMARY = 'default'
+
+
+class ReplicaPin:
+    """Состояние текущего запроса: можно ли читать из реплик."""
+
+    def __init__(self, pinned: bool = False):
+        # Читать из основной базы.
+        self.pinned = pinned
+        # В запросе была запись: закрепить и следующие запросы.
+        self.wrote = False
+
+
+current_pin: ContextVar[Optional[ReplicaPin]] = ContextVar(
+    'replica_pin', default=None
+)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        pin = current_pin.get()
+        replicas = settings.DATABASE_REPLICAS
+        if pin is None or pin.pinned or not replicas:
+            return PRIMARY
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        pin = current_pin.get()
+        if pin is not None:
+            pin.pinned = pin.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает в реплики вместе с данными.
+        return db == PRIMARY
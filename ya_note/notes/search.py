@@ -0,0 +1,189 @@
+"""
+Полнотекстовый поиск по заметкам.
+
+На SQLite с модулем FTS5 поиск идёт по виртуальной таблице
+notes_note_fts: она хранит индекс заголовков и текстов заметок,
+а триггеры на notes_note поддерживают его при вставке, изменении
+и удалении. Результаты упорядочены по релевантности (bm25) и
+снабжены фрагментами текста с подсвеченными совпадениями.
+
+Если FTS5 недоступен или база не SQLite, поиск откатывается
+к поиску подстроки в заголовке и тексте без учёта регистра.
+
+SQLite-бэкенд Django пересоздаёт таблицу при многих изменениях схемы
+(например, при добавлении поля), и триггеры при этом теряются.
+Миграции, изменяющие notes_note, должны заново создавать триггеры.
+SQL таблицы и триггеров для миграций заморожен в notes.migrations._fts,
+а не импортируется отсюда: миграции не должны меняться вместе с модулем.
+"""
+from itertools import islice
+from typing import List
+
+from django.db import OperationalError, connections
+from django.db.models import Q, QuerySet
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.text import Truncator
+
+from .models import Note
+
+FTS_TABLE = 'notes_note_fts'
+# Маркеры подсветки в snippet(): их не бывает в тексте заметок,
+# поэтому их можно заменить на теги после экранирования.
+MATCH_START, MATCH_END = '\x02', '\x03'
+SNIPPET_TOKENS = 16
+# Сколько заметок читать за раз при поиске без FTS5 на SQLite.
+FALLBACK_CHUNK_SIZE = 500
+
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, text,
+        content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+'''
+TRIGGERS = {
+    'notes_note_fts_insert': f'''
+        AFTER INSERT ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, text)
+            VALUES (new.id, new.title, new.text);
+        END
+    ''',
+    'notes_note_fts_delete': f'''
+        AFTER DELETE ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+            VALUES ('delete', old.id, old.title, old.text);
+        END
+    ''',
+    'notes_note_fts_update': f'''
+        AFTER UPDATE OF title, text ON notes_note BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+            VALUES ('delete', old.id, old.title, old.text);
+            INSERT INTO {FTS_TABLE}(rowid, title, text)
+            VALUES (new.id, new.title, new.text);
+        END
+    ''',
+}
+
+
+def install(connection) -> None:
+    """Создаёт индекс и триггеры и заполняет индекс текущими заметками."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE_TABLE)
+        except OperationalError:
+            # SQLite собран без FTS5: поиск будет работать через icontains.
+            return
+        for name, body in TRIGGERS.items():
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'CREATE TRIGGER {name} {body}')
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def uninstall(connection) -> None:
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name in TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def is_available(connection) -> bool:
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def to_fts_query(query: str) -> str:
+    """
+    Превращает ввод пользователя в безопасный запрос FTS5.
+
+    Каждое слово ищется как префикс, все слова должны встретиться.
+    Операторы и кавычки FTS5 из ввода не интерпретируются.
+    """
+    return ' '.join(
+        '"{}"*'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def highlight(snippet: str) -> str:
+    return mark_safe(
+        escape(snippet)
+        .replace(MATCH_START, '<mark>')
+        .replace(MATCH_END, '</mark>')
+    )
+
+
+def search_notes(queryset: QuerySet, query: str, limit: int) -> List[Note]:
+    """
+    Ищет query среди заметок из queryset.
+
+    Возвращает не больше limit заметок, самые релевантные первыми.
+    У каждой заметки есть атрибут snippet — фрагмент с совпадениями.
+    """
+    if not query.split():
+        return []
+    connection = connections[queryset.db]
+    if not is_available(connection):
+        return fallback_search(queryset, query, limit)
+    scope_sql, scope_params = queryset.values('pk').query.sql_with_params()
+    # Соединение с выборкой, а не rowid IN (...): с IN SQLite проверяет
+    # каждую найденную строку отдельно, и поиск замедляется на порядки.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            SELECT {FTS_TABLE}.rowid, snippet(
+                {FTS_TABLE}, -1, %s, %s, '…', {SNIPPET_TOKENS}
+            )
+            FROM {FTS_TABLE}
+            JOIN ({scope_sql}) AS scope ON scope.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s
+            ORDER BY rank
+            LIMIT %s
+            ''',
+            [MATCH_START, MATCH_END, *scope_params,
+             to_fts_query(query), limit]
+        )
+        snippets = dict(cursor.fetchall())
+    notes = queryset.in_bulk(snippets)
+    results = []
+    for pk, snippet in snippets.items():
+        if pk in notes:
+            notes[pk].snippet = highlight(snippet)
+            results.append(notes[pk])
+    return results
+
+
+def fallback_search(queryset: QuerySet, query: str, limit: int) -> List[Note]:
+    """
+    Поиск подстроки query без FTS5, новые заметки первыми.
+
+    LIKE и lower() в SQLite без ICU приводят к нижнему регистру только
+    латиницу: icontains по «пирог» не нашёл бы «Пирог». Поэтому
+    на SQLite регистр сравнивается в Python.
+    """
+    queryset = queryset.order_by('-id')
+    if connections[queryset.db].vendor != 'sqlite':
+        notes = list(queryset.filter(
+            Q(title__icontains=query) | Q(text__icontains=query)
+        )[:limit])
+    else:
+        needle = query.casefold()
+        notes = list(islice((
+            note for note in queryset.iterator(FALLBACK_CHUNK_SIZE)
+            if needle in note.title.casefold()
+            or needle in note.text.casefold()
+        ), limit))
+    for note in notes:
+        note.snippet = Truncator(note.text).words(SNIPPET_TOKENS)
+    return notes
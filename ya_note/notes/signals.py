@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import metrics
+from .cache import invalidate_user_notes
+from .models import Note
+
+
+@receiver((post_save, post_delete), sender=Note)
+def reset_user_notes(instance, **kwargs):
+    invalidate_user_notes(instance.author_id)
+
+
+@receiver(connection_created)
+def configure_sqlite(connection, **kwargs):
+    """Выполняет SQLITE_PRAGMAS на новом соединении с SQLite."""
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def record_queries(connection, **kwargs):
+    """Учитывает запросы соединения в метриках текущего запроса."""
+    if metrics.record_query not in connection.execute_wrappers:
+        # В начало: execute_wrapper() снимает с конца списка свою обёртку.
+        connection.execute_wrappers.insert(0, metrics.record_query)
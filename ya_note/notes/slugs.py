@@ -0,0 +1,167 @@
+"""
+Подбор уникального slug для заметки.
+
+Если slugify(title) уже занят, к нему добавляется суффикс -2, -3 и т.д.
+Все занятые варианты читаются одним запросом по префиксу. Префикс
+ищется диапазоном slug >= prefix AND slug < prefix + PREFIX_END:
+в отличие от LIKE, такое условие SQLite обслуживает уникальным
+индексом по slug. Из найденного остаются только сами base и их
+варианты с суффиксом.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db import connections
+from django.db.models import QuerySet
+from pytils.translit import slugify
+
+DEFAULT_SLUG = 'note'
+# Сколько символов оставлять под суффикс вида -1234567.
+SUFFIX_RESERVE = 8
+SLUGIFY_CACHE_SIZE = 4096
+# Больше префиксов в одном запросе SQLite не разберёт: глубина
+# выражения в WHERE ограничена тысячей.
+PREFIXES_PER_QUERY = 400
+# Больше любого символа slug: верхняя граница диапазона по префиксу.
+PREFIX_END = '\U0010ffff'
+# Вариант с суффиксом: всё до последнего дефиса и номер без нулей впереди.
+SUFFIXED_SLUG = re.compile(r'(.*)-([1-9][0-9]*)')
+
+# Транслитерация pytils заметно дороже поиска в словаре, а заголовки
+# часто повторяются. Счётчики попаданий и промахов доступны через
+# cached_slugify.cache_info().
+cached_slugify = lru_cache(maxsize=SLUGIFY_CACHE_SIZE)(slugify)
+
+
+def make_slug(title: str, max_length: int) -> str:
+    return cached_slugify(title)[:max_length] or DEFAULT_SLUG
+
+
+def allocate_slug(title: str, queryset: QuerySet, max_length: int) -> str:
+    """
+    Возвращает slug для title, не занятый ни одним объектом из queryset.
+
+    Выбор не защищён от гонки: параллельный запрос может занять тот же
+    slug, поэтому при IntegrityError выбор нужно повторить.
+    """
+    base = make_slug(title, max_length)
+    taken = taken_slugs(queryset, [base], max_length)
+    return first_free_slug(base, taken, max_length)[0]
+
+
+def allocate_slugs(
+    titles: Iterable[str], queryset: QuerySet, max_length: int
+) -> List[str]:
+    """
+    Подбирает slug для каждого из titles.
+
+    Занятые slug читаются одним запросом на каждые PREFIXES_PER_QUERY
+    различных префиксов. Slug уникальны и среди queryset, и между собой.
+    Как и allocate_slug, выбор не защищён от гонки.
+    """
+    bases = [make_slug(title, max_length) for title in titles]
+    taken = taken_slugs(queryset, bases, max_length)
+    # С какого номера продолжать перебор для base: тысяча заметок
+    # без заголовка не должна перебирать суффиксы заново каждый раз.
+    next_numbers: Dict[str, int] = {}
+    slugs = []
+    for base in bases:
+        slug, number = first_free_slug(
+            base, taken, max_length, next_numbers.get(base, 1)
+        )
+        next_numbers[base] = number + 1
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def taken_slugs(
+    queryset: QuerySet, bases: Iterable[str], max_length: int
+) -> Set[str]:
+    """
+    Slug из queryset, совпадающие с одним из bases или его вариантом
+    с суффиксом (см. with_suffix).
+
+    Условие собирается в SQL вокруг запроса queryset: построение
+    сотен условий через Q в ORM обходится дороже самого запроса.
+    Диапазон по префиксу отбирает строки по индексу, а условие
+    на окончание -<цифры> отсекает большую часть чужих slug ещё в базе.
+    """
+    bases_by_prefix: Dict[str, Set[str]] = defaultdict(set)
+    for base in bases:
+        bases_by_prefix[slug_prefix(base, max_length)].add(base)
+    prefixes = sorted(bases_by_prefix)
+    scope_sql, scope_params = queryset.values('slug').query.sql_with_params()
+    taken = set()
+    with connections[queryset.db].cursor() as cursor:
+        for start in range(0, len(prefixes), PREFIXES_PER_QUERY):
+            chunk = prefixes[start:start + PREFIXES_PER_QUERY]
+            chunk_bases = [
+                base for prefix in chunk for base in bases_by_prefix[prefix]
+            ]
+            condition = ' OR '.join(
+                ['(slug >= %s AND slug < %s)'] * len(chunk)
+            )
+            cursor.execute(
+                f'SELECT slug FROM ({scope_sql}) WHERE ({condition}) '
+                f"AND (rtrim(slug, '0123456789') LIKE '%%-' "
+                f'OR slug IN ({", ".join(["%s"] * len(chunk_bases))}))',
+                [*scope_params, *chain.from_iterable(
+                    (prefix, prefix + PREFIX_END) for prefix in chunk
+                ), *chunk_bases]
+            )
+            taken.update(
+                slug for slug, in cursor.fetchall()
+                if is_variant(slug, bases_by_prefix, max_length)
+            )
+    return taken
+
+
+def is_variant(
+    slug: str, bases_by_prefix: Dict[str, Set[str]], max_length: int
+) -> bool:
+    """Совпадает ли slug с with_suffix(base, n) для одного из bases."""
+    if slug in bases_by_prefix.get(slug_prefix(slug, max_length), ()):
+        return True
+    match = SUFFIXED_SLUG.fullmatch(slug)
+    if match is None or match[2] == '1':
+        return False
+    head = match[1]
+    bases = bases_by_prefix.get(slug_prefix(head, max_length), ())
+    if head in bases:
+        return True
+    # Суффикс вытеснил конец base: head — его начало нужной длины.
+    return len(head) == max_length - len(match[2]) - 1 and any(
+        base.startswith(head) for base in bases
+    )
+
+
+def slug_prefix(base: str, max_length: int) -> str:
+    """
+    Префикс, общий у base и всех его вариантов с суффиксом.
+
+    Суффикс может вытеснить конец base, поэтому префикс укорочен.
+    """
+    return base[:max_length - SUFFIX_RESERVE]
+
+
+def first_free_slug(
+    base: str, taken: Set[str], max_length: int, number: int = 1
+) -> Tuple[str, int]:
+    """Первый незанятый вариант base, начиная с number, и его номер."""
+    slug = with_suffix(base, number, max_length)
+    while slug in taken:
+        number += 1
+        slug = with_suffix(base, number, max_length)
+    return slug, number
+
+
+def with_suffix(base: str, number: int, max_length: int) -> str:
+    """Вариант base с номером: первый вариант — сам base."""
+    if number == 1:
+        return base
+    suffix = f'-{number}'
+    return base[:max_length - len(suffix)] + suffix
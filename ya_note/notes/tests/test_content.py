@@ -1,19 +1,28 @@
-from typing import List, Tuple, Union
+from http import HTTPStatus
+from typing import Dict, List, Tuple, Union
+from unittest import mock
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.db.models.query import QuerySet
 from django.http.response import HttpResponseBase
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from notes.forms import NoteForm
+from notes.metrics import registry
 from notes.models import Note
+from notes.tests.utils import (
+    CleanCacheMixin, QueryBudgetMixin, query_budget
+)
 
 
 User = get_user_model()
 
 
-class TestContent(TestCase):
+class TestContent(CleanCacheMixin, QueryBudgetMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.author: User = User.objects.create(
@@ -71,3 +80,250 @@ class TestContent(TestCase):
                     ('Убедитесь, что форма для создания заметки '
                      f'отображается на {url_name}.')
                 )
+
+    @override_settings(NOTES_COUNT_ON_LIST_PAGE=2)
+    def test_notes_list_pagination(self):
+        for number in range(4):
+            Note.objects.create(
+                title=f'Заметка {number}',
+                text='Текст',
+                author=self.author
+            )
+        url: str = reverse('notes:list')
+        expected_ids: List[int] = list(
+            Note.objects.filter(author=self.author).order_by(
+                'id'
+            ).values_list('id', flat=True)
+        )
+        shown_ids: List[int] = []
+        params = {}
+        while True:
+            response: HttpResponseBase = self.author_client.get(url, params)
+            notes_list: List[Note] = response.context['object_list']
+            self.assertLessEqual(
+                len(notes_list),
+                2,
+                ('Убедитесь, что на странице списка заметок выводится '
+                 'не больше NOTES_COUNT_ON_LIST_PAGE заметок.')
+            )
+            for note in notes_list:
+                self.assertIn(
+                    'text',
+                    note.get_deferred_fields(),
+                    ('Убедитесь, что для списка заметок не загружается '
+                     'их текст.')
+                )
+            shown_ids += [note.id for note in notes_list]
+            if 'next_cursor' not in response.context:
+                break
+            params['after'] = response.context['next_cursor']
+        self.assertEqual(
+            shown_ids,
+            expected_ids,
+            ('Убедитесь, что постраничный список показывает каждую '
+             'заметку пользователя ровно один раз.')
+        )
+
+    def test_search(self):
+        Note.objects.create(
+            title='Рецепт пирога',
+            text='Мука, яйца и немного сахара',
+            author=self.author
+        )
+        Note.objects.create(
+            title='Чужой пирог',
+            text='Пирог другого пользователя',
+            author=self.another_user
+        )
+        url: str = reverse('notes:search')
+        response: HttpResponseBase = self.author_client.get(
+            url, {'q': 'пирог'}
+        )
+        found: List[Note] = response.context['object_list']
+        self.assertEqual(
+            [note.title for note in found],
+            ['Рецепт пирога'],
+            ('Убедитесь, что поиск находит заметки по началу слова '
+             'и только среди заметок пользователя.')
+        )
+        response = self.author_client.get(url, {'q': 'сахар'})
+        self.assertIn(
+            '<mark>сахара</mark>',
+            response.content.decode(),
+            'Убедитесь, что в результатах поиска подсвечиваются совпадения.'
+        )
+
+    def test_search_without_fts(self):
+        Note.objects.create(
+            title='Пирог с капустой', text='Тесто', author=self.author
+        )
+        url: str = reverse('notes:search')
+        with mock.patch('notes.search.is_available', return_value=False):
+            response: HttpResponseBase = self.author_client.get(
+                url, {'q': 'пирог'}
+            )
+        self.assertEqual(
+            [note.title for note in response.context['object_list']],
+            ['Пирог с капустой'],
+            ('Убедитесь, что поиск без FTS5 не учитывает регистр '
+             'и в кириллице.')
+        )
+
+    def test_search_index_follows_changes(self):
+        url: str = reverse('notes:search')
+        self.author_note.text = 'Совсем другой текст'
+        self.author_note.save()
+        response: HttpResponseBase = self.author_client.get(
+            url, {'q': 'другой'}
+        )
+        self.assertIn(
+            self.author_note,
+            response.context['object_list'],
+            'Убедитесь, что поисковый индекс обновляется вместе с заметкой.'
+        )
+        self.author_note.delete()
+        response = self.author_client.get(url, {'q': 'другой'})
+        self.assertEqual(
+            list(response.context['object_list']),
+            [],
+            'Убедитесь, что удалённые заметки пропадают из поиска.'
+        )
+
+    def test_list_conditional_get(self):
+        url: str = reverse('notes:list')
+        etag: str = self.author_client.get(url)['ETag']
+        # Сессия, пользователь и одно агрегатное обращение к заметкам.
+        with self.assertNumQueries(3):
+            response: HttpResponseBase = self.author_client.get(
+                url, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.NOT_MODIFIED,
+            ('Убедитесь, что неизменившийся список заметок '
+             'отдаётся с кодом 304.')
+        )
+        self.assertNotEqual(
+            self.another_user_client.get(url)['ETag'],
+            etag,
+            'Убедитесь, что ETag списка заметок у каждого пользователя свой.'
+        )
+        Note.objects.create(
+            title='Новая заметка', text='Текст', author=self.author
+        )
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.OK,
+            ('Убедитесь, что после добавления заметки список '
+             'отдаётся заново.')
+        )
+        etag = response['ETag']
+        Note.objects.filter(title='Новая заметка').delete()
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.OK,
+            ('Убедитесь, что после удаления заметки список '
+             'отдаётся заново.')
+        )
+
+    def test_detail_conditional_get(self):
+        url: str = reverse('notes:detail', args=(self.author_note.slug,))
+        response: HttpResponseBase = self.author_client.get(url)
+        for header, value in (
+            ('HTTP_IF_NONE_MATCH', response['ETag']),
+            ('HTTP_IF_MODIFIED_SINCE', response['Last-Modified']),
+        ):
+            with self.subTest(header=header):
+                response = self.author_client.get(url, **{header: value})
+                self.assertEqual(
+                    response.status_code,
+                    HTTPStatus.NOT_MODIFIED,
+                    ('Убедитесь, что неизменившаяся заметка отдаётся '
+                     'с кодом 304.')
+                )
+        etag: str = self.author_client.get(url)['ETag']
+        self.author_note.text = 'Обновлённый текст'
+        self.author_note.save()
+        response = self.author_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.OK,
+            'Убедитесь, что изменённая заметка отдаётся заново.'
+        )
+
+    def test_server_timing_counts_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response: HttpResponseBase = self.author_client.get(
+                reverse('notes:list')
+            )
+        timings: Dict[str, str] = {
+            metric.split(';')[0]: metric
+            for metric in response['Server-Timing'].split(', ')
+        }
+        self.assertEqual(
+            set(timings),
+            {'db', 'template', 'total'},
+            ('Убедитесь, что в Server-Timing есть время базы, '
+             'шаблона и полное время ответа.')
+        )
+        self.assertIn(
+            f'desc="{len(queries)} queries"',
+            timings['db'],
+            'Убедитесь, что Server-Timing показывает все SQL-запросы ответа.'
+        )
+
+    def test_metrics_histograms(self):
+        registry.clear()
+        for _ in range(3):
+            self.author_client.get(reverse('notes:list'))
+        staff_client: Client = Client()
+        staff_client.force_login(
+            User.objects.create(username='Сотрудник', is_staff=True)
+        )
+        response: HttpResponseBase = staff_client.get(
+            reverse('notes:metrics')
+        )
+        self.assertTrue(
+            response['Content-Type'].startswith('text/plain; version=0.0.4'),
+            'Убедитесь, что метрики отдаются в текстовом формате Prometheus.'
+        )
+        lines: List[str] = response.content.decode().splitlines()
+        for name in ('view_duration_seconds', 'view_db_seconds',
+                     'view_template_seconds', 'view_queries'):
+            with self.subTest(name=name):
+                self.assertIn(
+                    f'# TYPE {name} histogram',
+                    lines,
+                    f'Убедитесь, что метрики содержат гистограмму {name}.'
+                )
+                self.assertIn(
+                    f'{name}_count{{view="notes:list"}} 3',
+                    lines,
+                    ('Убедитесь, что гистограммы учитывают каждый запрос '
+                     'к представлению.')
+                )
+
+    def add_notes(self) -> None:
+        Note.objects.bulk_create(
+            Note(
+                title=f'Заметка {number}',
+                text='Текст',
+                slug=f'zametka-{number}',
+                author=self.author,
+            )
+            for number in range(settings.NOTES_COUNT_ON_LIST_PAGE * 2)
+        )
+
+    def test_list_query_budget(self):
+        url: str = reverse('notes:list')
+        self.assertQueryBudget(
+            4, lambda: self.author_client.get(url), self.add_notes
+        )
+
+    @query_budget(3, add_data='add_notes')
+    def test_detail_query_budget(self):
+        self.author_client.get(
+            reverse('notes:detail', args=(self.author_note.slug,))
+        )
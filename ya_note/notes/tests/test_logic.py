@@ -1,21 +1,39 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from io import StringIO
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Barrier, local
 from typing import Dict, List
+from unittest import mock
 
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
 from django.forms.models import model_to_dict
 from django.http.response import HttpResponseBase
-from django.test import Client, TestCase
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 from pytils.translit import slugify
 
+from notes import search, slugs
 from notes.forms import WARNING
-from notes.models import Note
+from notes.middleware import PIN_COOKIE
+from notes.models import Note, VersionConflict
+from notes.tests.utils import (
+    CleanCacheMixin, read_sqlite_pragmas, retry_locked
+)
 
 
 User = get_user_model()
 SLUG_MAX_LENGTH: int = Note._meta.get_field('slug').max_length
 
 
-class TestLogic(TestCase):
+class TestLogic(CleanCacheMixin, TestCase):
     NOTE_DATA: Dict[str, str] = {
         'title': 'Заголовок',
         'text': 'Текст',
@@ -139,6 +157,33 @@ class TestLogic(TestCase):
             'Убедитесь, что заметка с уже существующим slug не сохраняется.'
         )
 
+    def test_note_slug_taken_concurrently(self):
+        url: str = reverse('notes:add')
+        notes_in_db: int = Note.objects.count()
+        # Имитируем гонку: проверки формы не увидели занятый slug.
+        with mock.patch(
+            'notes.forms.NoteForm.clean_slug',
+            lambda form: form.cleaned_data['slug']
+        ), mock.patch(
+            'notes.forms.NoteForm.validate_unique', lambda form: None
+        ):
+            response: HttpResponseBase = self.author_client.post(
+                url, data=model_to_dict(self.note_check_slug)
+            )
+        self.assertFormError(
+            response,
+            'form',
+            'slug',
+            self.note_check_slug.slug + WARNING,
+            ('Убедитесь, что slug, занятый между проверкой формы и '
+             'записью, возвращается ошибкой формы, а не ошибкой 500.')
+        )
+        self.assertEqual(
+            Note.objects.count(),
+            notes_in_db,
+            'Убедитесь, что заметка с уже существующим slug не сохраняется.'
+        )
+
     def test_create_slug_if_not_stated(self):
         url: str = reverse('notes:add')
         notes_before_post_ids = set(
@@ -222,6 +267,46 @@ class TestLogic(TestCase):
              'заметка действительно удаляется.')
         )
 
+    def test_edit_conflict(self):
+        url: str = reverse('notes:edit', args=(self.author_note.slug,))
+        stale_version: int = self.author_client.get(url).context[
+            'form'
+        ]['version'].value()
+        concurrent_edit: Note = Note.objects.get(id=self.author_note.id)
+        concurrent_edit.text = 'Правка из другой вкладки'
+        concurrent_edit.save()
+        response: HttpResponseBase = self.author_client.post(
+            url, data={**self.NOTE_DATA, 'version': stale_version}
+        )
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.CONFLICT,
+            ('Убедитесь, что правка устаревшей версии заметки '
+             'возвращает код 409.')
+        )
+        self.assertEqual(
+            Note.objects.get(id=self.author_note.id).text,
+            concurrent_edit.text,
+            'Убедитесь, что правка устаревшей версии не затирает заметку.'
+        )
+        self.assertContains(
+            response, concurrent_edit.text, status_code=HTTPStatus.CONFLICT,
+            msg_prefix=('Убедитесь, что при конфликте пользователю '
+                        'показывается текущая версия заметки.')
+        )
+        response = self.author_client.post(
+            url, data={
+                **self.NOTE_DATA,
+                'version': response.context['form']['version'].value(),
+            }
+        )
+        self.assertRedirects(
+            response,
+            expected_url=reverse('notes:success'),
+            msg_prefix=('Убедитесь, что после объединения правок '
+                        'заметка сохраняется.')
+        )
+
     def test_another_user_cant_edit_note(self):
         url: str = reverse('notes:edit', args=(self.author_note.slug,))
         self.another_user_client.post(url, data=self.NOTE_DATA)
@@ -258,3 +343,477 @@ class TestLogic(TestCase):
             ('Убедитесь, что заметка не удаляется '
              'по запросу не её автора.')
         )
+
+
+class TestSlugAllocation(CleanCacheMixin, TransactionTestCase):
+    TITLE: str = 'Одинаковый заголовок'
+    PARALLEL_CREATES: int = 8
+
+    def setUp(self):
+        super().setUp()
+        self.author: User = User.objects.create(username='Автор')
+
+    def create_note(self, number: int) -> str:
+        """
+        Create a note with the same title from any thread.
+
+        SQLite in-memory test database doesn't wait for locks held
+        by other connections, so retry like a busy handler would.
+        """
+        try:
+            return retry_locked(lambda: Note.objects.create(
+                title=self.TITLE,
+                text=f'Текст {number}',
+                author=self.author
+            ).slug)
+        finally:
+            connection.close()
+
+    def test_duplicate_titles_get_suffixes(self):
+        base_slug: str = slugify(self.TITLE)[:SLUG_MAX_LENGTH]
+        created_slugs: List[str] = [
+            self.create_note(number) for number in range(3)
+        ]
+        self.assertEqual(
+            created_slugs,
+            [base_slug, f'{base_slug}-2', f'{base_slug}-3'],
+            ('Убедитесь, что заметки с одинаковым заголовком получают '
+             'slug с суффиксами -2, -3 и т.д.')
+        )
+
+    def test_taken_slugs_ignore_other_slugs(self):
+        base_slug: str = slugify(self.TITLE)[:SLUG_MAX_LENGTH]
+        for slug in (base_slug, f'{base_slug}-2', f'{base_slug}-extra',
+                     f'{base_slug}-2-3', f'{base_slug}x-4'):
+            Note.objects.create(
+                title=self.TITLE, text='Текст', slug=slug, author=self.author
+            )
+        self.assertEqual(
+            slugs.taken_slugs(
+                Note.objects.all(), [base_slug], SLUG_MAX_LENGTH
+            ),
+            {base_slug, f'{base_slug}-2'},
+            ('Убедитесь, что taken_slugs возвращает только base '
+             'и варианты base-<номер>.')
+        )
+
+    def test_slugify_is_cached(self):
+        slugs.cached_slugify.cache_clear()
+        for number in range(2):
+            self.create_note(number)
+        cache_info = slugs.cached_slugify.cache_info()
+        self.assertEqual(
+            (cache_info.hits, cache_info.misses),
+            (1, 1),
+            ('Убедитесь, что slug для повторяющегося заголовка '
+             'берётся из кэша cached_slugify.')
+        )
+
+    def test_slug_taken_concurrently(self):
+        base_slug: str = slugify(self.TITLE)[:SLUG_MAX_LENGTH]
+        Note.objects.create(
+            title=self.TITLE, text='Текст', author=self.author
+        )
+        # Имитируем гонку: первый подбор не увидел, что slug уже занят.
+        allocations = iter([lambda *args: base_slug, slugs.allocate_slug])
+        with mock.patch(
+            'notes.models.allocate_slug',
+            side_effect=lambda *args: next(allocations)(*args)
+        ):
+            note: Note = Note.objects.create(
+                title=self.TITLE, text='Текст', author=self.author
+            )
+        self.assertEqual(
+            note.slug,
+            f'{base_slug}-2',
+            ('Убедитесь, что при конфликте slug при вставке '
+             'Note.save подбирает его заново.')
+        )
+
+    def test_parallel_creates(self):
+        # Все потоки подбирают slug до того, как кто-либо его займёт.
+        barrier = Barrier(self.PARALLEL_CREATES, timeout=5)
+        thread_state = local()
+
+        def allocate_together(*args):
+            slug = slugs.allocate_slug(*args)
+            if not getattr(thread_state, 'allocated', False):
+                thread_state.allocated = True
+                barrier.wait()
+            return slug
+
+        with mock.patch(
+            'notes.models.allocate_slug', side_effect=allocate_together
+        ), ThreadPoolExecutor(max_workers=self.PARALLEL_CREATES) as pool:
+            created_slugs: List[str] = list(pool.map(
+                self.create_note, range(self.PARALLEL_CREATES)
+            ))
+        self.assertEqual(
+            len(set(created_slugs)),
+            self.PARALLEL_CREATES,
+            ('Убедитесь, что параллельно созданные заметки с одинаковым '
+             'заголовком получают разные slug.')
+        )
+        self.assertEqual(
+            Note.objects.filter(title=self.TITLE).count(),
+            self.PARALLEL_CREATES,
+            'Убедитесь, что ни одна из параллельных заметок не потерялась.'
+        )
+
+
+class TestOptimisticLocking(CleanCacheMixin, TransactionTestCase):
+    EDITORS: int = 8
+    EDITS_PER_EDITOR: int = 5
+
+    def setUp(self):
+        super().setUp()
+        author: User = User.objects.create(username='Автор')
+        self.note: Note = Note.objects.create(
+            title='Счётчик', text='0', author=author
+        )
+
+    def run_editors(self, edit) -> List:
+        def run(number: int):
+            try:
+                return edit(number)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.EDITORS) as pool:
+            return list(pool.map(run, range(self.EDITORS)))
+
+    def save(self, note: Note) -> None:
+        """Save the version that was loaded, from any thread."""
+        retry_locked(lambda: note.save_if_version(note.version))
+
+    def load(self) -> Note:
+        return retry_locked(lambda: Note.objects.get(pk=self.note.pk))
+
+    def test_only_one_of_concurrent_editors_wins(self):
+        barrier = Barrier(self.EDITORS, timeout=5)
+
+        def edit(number: int) -> bool:
+            note: Note = self.load()
+            barrier.wait()
+            note.text = f'Правка {number}'
+            try:
+                self.save(note)
+            except VersionConflict:
+                return False
+            return True
+
+        results: List[bool] = self.run_editors(edit)
+        self.assertEqual(
+            results.count(True),
+            1,
+            ('Убедитесь, что из правок одной и той же версии заметки '
+             'сохраняется только одна.')
+        )
+        self.assertEqual(
+            self.load().version,
+            2,
+            'Убедитесь, что успешная правка увеличивает версию на 1.'
+        )
+
+    def test_no_lost_updates(self):
+        def edit(number: int) -> None:
+            for _ in range(self.EDITS_PER_EDITOR):
+                saved = False
+                while not saved:
+                    note: Note = self.load()
+                    note.text = str(int(note.text) + 1)
+                    try:
+                        self.save(note)
+                        saved = True
+                    except VersionConflict:
+                        pass
+
+        self.run_editors(edit)
+        total_edits: int = self.EDITORS * self.EDITS_PER_EDITOR
+        note: Note = self.load()
+        self.assertEqual(
+            (int(note.text), note.version),
+            (total_edits, total_edits + 1),
+            ('Убедитесь, что при одновременных правках с повтором '
+             'после конфликта ни одна правка не теряется.')
+        )
+
+
+class TestImportExport(CleanCacheMixin, TestCase):
+    TITLE: str = 'Одинаковый заголовок'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author: User = User.objects.create(username='Автор')
+        cls.reader: User = User.objects.create(username='Читатель')
+        cls.existing_note: Note = Note.objects.create(
+            title=cls.TITLE, text='Текст', author=cls.author
+        )
+
+    def setUp(self):
+        super().setUp()
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_path: Path = Path(temp_dir.name)
+
+    def test_import_allocates_unique_slugs(self):
+        base_slug: str = self.existing_note.slug
+        rows: List[Dict[str, str]] = [
+            {'title': self.TITLE, 'text': f'Текст {number}'}
+            for number in range(3)
+        ] + [
+            {'title': 'Свой адрес', 'text': 'Текст', 'slug': base_slug},
+            {'title': 'Без текста', 'text': ''},
+            {'title': 'Slug числом', 'text': 'Текст', 'slug': 123},
+            {'title': 'Пустой slug', 'text': 'Текст', 'slug': None},
+        ]
+        archive: Path = self.temp_path / 'notes.jsonl'
+        archive.write_text(
+            '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows),
+            encoding='utf-8'
+        )
+        stdout = StringIO()
+        # Автор, занятые slug, вставка и точка сохранения вокруг неё.
+        with self.assertNumQueries(5):
+            call_command(
+                'import_notes', archive, author=self.author.username,
+                stdout=stdout
+            )
+        self.assertIn(
+            'пропущено: 3.',
+            stdout.getvalue(),
+            ('Убедитесь, что import_notes пропускает строки без текста '
+             'и со slug, который не является строкой.')
+        )
+        imported = Note.objects.exclude(
+            pk=self.existing_note.pk
+        ).order_by('pk')
+        self.assertEqual(
+            [note.slug for note in imported],
+            [f'{base_slug}-{number}' for number in range(2, 6)],
+            ('Убедитесь, что import_notes подбирает уникальные slug '
+             'для всей пачки одним запросом и вставляет её одним запросом.')
+        )
+
+    def test_markdown_round_trip(self):
+        Note.objects.create(
+            title='Markdown',
+            text='# Не заголовок\n\\ обратная черта\n\nВторой абзац',
+            author=self.author
+        )
+        Note.objects.create(
+            title='  Заголовок с отступом ',
+            text='Строки\r\nиз Windows\r\n\r\n# и заголовок',
+            author=self.author
+        )
+        expected = list(Note.objects.values_list('title', 'text', 'slug'))
+        dump: Path = self.temp_path / 'notes.md'
+        call_command('export_notes', output=dump, author=self.author.username)
+        stdout = StringIO()
+        call_command(
+            'export_notes', export_format='markdown',
+            author=self.author.username, stdout=stdout
+        )
+        self.assertEqual(
+            stdout.getvalue(),
+            dump.read_bytes().decode('utf-8'),
+            ('Убедитесь, что export_notes без --output пишет выгрузку '
+             'в self.stdout команды.')
+        )
+        Note.objects.all().delete()
+        call_command(
+            'import_notes', dump, author=self.reader.username,
+            stdout=StringIO()
+        )
+        self.assertEqual(
+            list(Note.objects.values_list('title', 'text', 'slug')),
+            expected,
+            ('Убедитесь, что выгрузка export_notes в Markdown '
+             'загружается через import_notes без изменений.')
+        )
+
+
+class TestNoteCache(CleanCacheMixin, TestCase):
+    FILE_CACHE: str = 'notes-file'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author: User = User.objects.create(username='Автор')
+        cls.another_user: User = User.objects.create(username='Читатель')
+        cls.note: Note = Note.objects.create(
+            title='Заметка', text='Текст', author=cls.author
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.author_client: Client = Client()
+        self.author_client.force_login(self.author)
+        self.detail_url: str = reverse('notes:detail', args=(self.note.slug,))
+        temp_dir = TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        file_cache = {
+            **settings.CACHES[self.FILE_CACHE], 'LOCATION': temp_dir.name
+        }
+        self.backends = {
+            'locmem': override_settings(NOTES_CACHE_ALIAS='notes'),
+            'file': override_settings(
+                CACHES={**settings.CACHES, self.FILE_CACHE: file_cache},
+                NOTES_CACHE_ALIAS=self.FILE_CACHE,
+            ),
+        }
+
+    def test_detail_read_from_cache(self):
+        for backend, override in self.backends.items():
+            with self.subTest(backend=backend), override:
+                self.author_client.get(self.detail_url)
+                # Только сессия и пользователь, заметка — из кэша.
+                with self.assertNumQueries(2):
+                    response: HttpResponseBase = self.author_client.get(
+                        self.detail_url
+                    )
+                self.assertEqual(
+                    response.context['object'],
+                    self.note,
+                    'Убедитесь, что заметка из кэша выводится на странице.'
+                )
+
+    def test_cache_invalidated_on_save(self):
+        for backend, override in self.backends.items():
+            with self.subTest(backend=backend), override:
+                self.author_client.get(self.detail_url)
+                new_text: str = f'Новый текст ({backend})'
+                self.author_client.post(
+                    reverse('notes:edit', args=(self.note.slug,)),
+                    {'title': self.note.title, 'text': new_text,
+                     'slug': self.note.slug}
+                )
+                response: HttpResponseBase = self.author_client.get(
+                    self.detail_url
+                )
+                self.assertEqual(
+                    response.context['object'].text,
+                    new_text,
+                    ('Убедитесь, что после редактирования заметки '
+                     'кэш сбрасывается.')
+                )
+
+    def test_cache_is_per_user(self):
+        self.author_client.get(self.detail_url)
+        another_user_client: Client = Client()
+        another_user_client.force_login(self.another_user)
+        self.assertEqual(
+            another_user_client.get(self.detail_url).status_code,
+            HTTPStatus.NOT_FOUND,
+            ('Убедитесь, что заметка из кэша недоступна '
+             'другим пользователям.')
+        )
+
+
+class TestDatabaseProfile(TestCase):
+
+    @override_settings(SQLITE_PRAGMAS=settings.SQLITE_PRODUCTION_PRAGMAS)
+    def test_production_sqlite_pragmas(self):
+        pragmas = read_sqlite_pragmas(settings.SQLITE_PRAGMAS)
+        self.assertEqual(
+            pragmas,
+            {
+                'journal_mode': 'wal',
+                'synchronous': 1,
+                'busy_timeout': 5000,
+                'cache_size': -64 * 1024,
+                'mmap_size': 256 * 1024 * 1024,
+            },
+            ('Убедитесь, что в профиле production новое соединение '
+             'с SQLite получает PRAGMA из SQLITE_PRODUCTION_PRAGMAS.')
+        )
+
+
+class TestReplicaRouting(CleanCacheMixin, TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        self.author: User = User.objects.create(username='Автор')
+        self.author_client: Client = Client()
+        self.author_client.force_login(self.author)
+        self.other_session: Client = Client()
+        self.other_session.force_login(self.author)
+        Note.objects.create(title='Первая', text='Текст', author=self.author)
+        self.sync_replica()
+
+    def sync_replica(self) -> None:
+        """
+        Copy primary test database into replica.
+
+        Stands in for replication: between calls replica lags behind.
+        """
+        primary, replica = connections['default'], connections['replica']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def list_titles(self, client: Client) -> List[str]:
+        return [
+            note.title
+            for note in client.get(reverse('notes:list')).context[
+                'object_list'
+            ]
+        ]
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_reads_follow_own_writes_to_primary(self):
+        # Реплика отстаёт: изменения видны только в основной базе.
+        Note.objects.update(title='Изменённая')
+        self.assertEqual(
+            self.list_titles(self.author_client),
+            ['Первая'],
+            'Убедитесь, что список заметок читается из реплики.'
+        )
+        response: HttpResponseBase = self.author_client.post(
+            reverse('notes:add'), data={'title': 'Вторая', 'text': 'Текст'}
+        )
+        self.assertIn(
+            PIN_COOKIE,
+            response.cookies,
+            'Убедитесь, что после записи чтение закрепляется '
+            'за основной базой.'
+        )
+        self.assertEqual(
+            self.list_titles(self.author_client),
+            ['Изменённая', 'Вторая'],
+            ('Убедитесь, что после записи пользователь читает '
+             'из основной базы и видит свою заметку.')
+        )
+        self.assertEqual(
+            self.list_titles(self.other_session),
+            ['Первая'],
+            ('Убедитесь, что сессии без записи по-прежнему '
+             'читают из реплики.')
+        )
+
+
+class TestSearchMigrations(TransactionTestCase):
+
+    def search_triggers(self) -> List[str]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                'AND name IN (%s, %s, %s) ORDER BY name',
+                sorted(search.TRIGGERS)
+            )
+            return [name for name, in cursor.fetchall()]
+
+    def test_rollback_keeps_search_triggers(self):
+        if not search.is_available(connection):
+            self.skipTest('SQLite собран без FTS5.')
+        try:
+            for target in ('0004', '0003'):
+                call_command('migrate', 'notes', target, verbosity=0)
+                self.assertEqual(
+                    self.search_triggers(),
+                    sorted(search.TRIGGERS),
+                    ('Убедитесь, что после отката до миграции '
+                     f'{target} триггеры поискового индекса на месте.')
+                )
+        finally:
+            call_command('migrate', 'notes', verbosity=0)
@@ -7,12 +7,13 @@ from django.test import Client, TestCase
 from django.urls import reverse
 
 from notes.models import Note
+from notes.tests.utils import CleanCacheMixin
 
 
 User = get_user_model()
 
 
-class TestRoutes(TestCase):
+class TestRoutes(CleanCacheMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.anonim_client: Client = Client()
@@ -26,6 +27,10 @@ class TestRoutes(TestCase):
         )
         cls.author_client.force_login(author)
         cls.another_user_client.force_login(another_user)
+        cls.staff_client: Client = Client()
+        cls.staff_client.force_login(
+            User.objects.create(username='Сотрудник', is_staff=True)
+        )
         cls.note: Note = Note.objects.create(
             title='Заголовок',
             text='Текст',
@@ -63,6 +68,10 @@ class TestRoutes(TestCase):
              (self.anonim_client, HTTPStatus.OK)),
             (reverse('users:logout'),
              (self.anonim_client, HTTPStatus.OK)),
+            (reverse('notes:metrics'),
+             (self.anonim_client, HTTPStatus.FOUND),
+             (self.another_user_client, HTTPStatus.FORBIDDEN),
+             (self.staff_client, HTTPStatus.OK)),
         ]
         for url, *clients_and_codes in urls_clients_codes:
             with self.subTest(
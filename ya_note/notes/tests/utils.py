@@ -0,0 +1,154 @@
+import re
+from functools import wraps
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import sleep
+from typing import Callable, Dict, Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+LOCK_RETRIES: int = 1000
+# «database is locked» или «database table is locked: …» в общей
+# кэш-памяти SQLite, которую использует тестовая база в памяти.
+# Если заблокированы служебные таблицы FTS5, SQLite сообщает
+# «vtable constructor failed: <таблица индекса>».
+LOCK_ERROR = re.compile(
+    r'database (table )?is locked|vtable constructor failed'
+)
+
+
+def retry_locked(action):
+    """
+    Run action, retrying SQLite lock errors.
+
+    SQLite in-memory test database doesn't wait for locks held
+    by other connections, so retry like a busy handler would.
+    Other errors are raised at once, and the lock error too after
+    LOCK_RETRIES attempts.
+    """
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return action()
+        except OperationalError as error:
+            if not LOCK_ERROR.search(str(error)) or (
+                attempt == LOCK_RETRIES - 1
+            ):
+                raise
+            sleep(0.01)
+
+
+def read_sqlite_pragmas(names: Iterable[str]) -> Dict[str, object]:
+    """
+    Return PRAGMA values a new connection to a file database gets.
+
+    WAL mode needs a database file, and the test database is in memory,
+    so a copy of the connection is opened on a temporary file.
+    """
+    file_connection = connection.copy()
+    pragmas = {}
+    with TemporaryDirectory() as directory:
+        file_connection.settings_dict = {
+            **connection.settings_dict,
+            'NAME': str(Path(directory) / 'db.sqlite3'),
+        }
+        try:
+            with file_connection.cursor() as cursor:
+                for name in names:
+                    cursor.execute(f'PRAGMA {name}')
+                    pragmas[name] = cursor.fetchone()[0]
+        finally:
+            file_connection.close()
+    return pragmas
+
+
+def count_queries(make_request: Callable[[], object]) -> int:
+    """
+    Return the number of queries made by make_request().
+
+    Notes cache is cleared first, so pages are rendered from the database.
+    """
+    caches[settings.NOTES_CACHE_ALIAS].clear()
+    with CaptureQueriesContext(connection) as queries:
+        make_request()
+    return len(queries)
+
+
+def check_query_budget(
+    test: TestCase,
+    budget: int,
+    make_request: Callable[[], object],
+    add_data: Callable[[], object],
+) -> None:
+    """
+    Count the queries of make_request(), call add_data() to seed
+    much more data and count again.
+
+    The count must fit into budget and must not grow with data size,
+    which is how N+1 queries show up.
+    """
+    small: int = count_queries(make_request)
+    add_data()
+    large: int = count_queries(make_request)
+    test.assertEqual(
+        large,
+        small,
+        ('Убедитесь, что число запросов не растёт с объёмом данных: '
+         f'было {small}, стало {large}.')
+    )
+    test.assertLessEqual(
+        large,
+        budget,
+        (f'Убедитесь, что страница укладывается в {budget} запросов, '
+         f'а не делает {large}.')
+    )
+
+
+class CleanCacheMixin:
+    """
+    Start and end every test with an empty notes cache.
+
+    Notes are cached by primary key, and keys repeat between tests
+    after rollback, so a test could read a note cached by another one.
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache = caches[settings.NOTES_CACHE_ALIAS]
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+
+class QueryBudgetMixin:
+    """Query budget assertion for TestCase."""
+
+    def assertQueryBudget(
+        self,
+        budget: int,
+        make_request: Callable[[], object],
+        add_data: Callable[[], object],
+    ) -> None:
+        """See check_query_budget."""
+        check_query_budget(self, budget, make_request, add_data)
+
+
+def query_budget(budget: int, add_data: str):
+    """
+    Decorator form of QueryBudgetMixin.assertQueryBudget.
+
+    The decorated test method makes the request to check; add_data
+    names the test case method that seeds much more data.
+    """
+    def decorator(test_method):
+        @wraps(test_method)
+        def wrapper(self):
+            check_query_budget(
+                self, budget,
+                lambda: test_method(self),
+                getattr(self, add_data),
+            )
+        return wrapper
+    return decorator
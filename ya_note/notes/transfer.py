@@ -0,0 +1,131 @@
+"""
+Перенос заметок в форматах JSONL и Markdown.
+
+JSONL — по объекту на строку с полями title, text и необязательным slug.
+Markdown — заметки подряд, каждая начинается с заголовка первого уровня:
+
+    # Заголовок
+    <!-- slug: zagolovok -->
+
+    Текст заметки.
+
+Строки текста, которые начинаются с «#» или «\\», при выгрузке
+экранируются обратной косой чертой. Концы строк (\\n, \\r\\n, \\r)
+сохраняются как есть, поэтому текст переживает выгрузку и загрузку
+без изменений, если файл открыт с newline=''.
+
+Чтение и запись потоковые: заметки читаются и пишутся по одной.
+"""
+import io
+import json
+import re
+from typing import Dict, Iterable, Iterator, Optional, TextIO
+
+from .models import Note
+
+FORMATS = ('jsonl', 'markdown')
+EXPORT_FIELDS = ('title', 'text', 'slug')
+SLUG_LINE = re.compile(r'<!-- slug: (\S+) -->')
+
+
+class TransferError(ValueError):
+    """Ошибка в файле импорта; в сообщении указан номер строки."""
+
+
+def guess_format(path) -> str:
+    if str(path).endswith(('.md', '.markdown')):
+        return 'markdown'
+    return 'jsonl'
+
+
+def read_jsonl(source: TextIO) -> Iterator[Dict[str, str]]:
+    for line_number, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as error:
+            raise TransferError(f'Строка {line_number}: {error}.')
+
+
+def read_markdown(source: TextIO) -> Iterator[Dict[str, str]]:
+    note: Optional[Dict[str, str]] = None
+    lines = []
+    for line_number, line in enumerate(source, start=1):
+        # Конец строки остаётся в тексте заметки: он может быть и \r\n.
+        content = line.rstrip('\r\n')
+        if content.startswith('# '):
+            if note is not None:
+                yield finish_markdown_note(note, lines)
+            note, lines = {'title': content[2:]}, []
+        elif note is None:
+            if content.strip():
+                raise TransferError(
+                    f'Строка {line_number}: текст до заголовка заметки.'
+                )
+        elif not lines and 'slug' not in note and SLUG_LINE.fullmatch(
+            content
+        ):
+            note['slug'] = SLUG_LINE.fullmatch(content).group(1)
+        else:
+            lines.append(line[1:] if line.startswith('\\') else line)
+    if note is not None:
+        yield finish_markdown_note(note, lines)
+
+
+def finish_markdown_note(note: Dict[str, str], lines) -> Dict[str, str]:
+    # Пустая строка после заголовка и пустая строка между заметками.
+    note['text'] = ''.join(lines).strip('\r\n')
+    return note
+
+
+READERS = {'jsonl': read_jsonl, 'markdown': read_markdown}
+
+
+def iter_notes(queryset, chunk_size: int = 2000) -> Iterator[Dict]:
+    rows = queryset.order_by('pk').values_list(*EXPORT_FIELDS)
+    for values in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(EXPORT_FIELDS, values))
+
+
+def to_jsonl(note: Dict[str, str]) -> str:
+    return json.dumps(note, ensure_ascii=False) + '\n'
+
+
+def to_markdown(note: Dict[str, str]) -> str:
+    # Строки делятся так же, как при чтении файла с newline='':
+    # splitlines делит и по символам, которые read_markdown
+    # концом строки не считает.
+    text = ''.join(
+        '\\' + line if line.startswith(('#', '\\')) else line
+        for line in io.StringIO(note['text'], newline='')
+    )
+    return (
+        f'# {note["title"]}\n'
+        f'<!-- slug: {note["slug"]} -->\n\n'
+        f'{text}\n\n'
+    )
+
+
+WRITERS = {'jsonl': to_jsonl, 'markdown': to_markdown}
+
+
+def iter_export(
+    notes: Iterable[Dict[str, str]], export_format: str
+) -> Iterator[str]:
+    write = WRITERS[export_format]
+    for note in notes:
+        yield write(note)
+
+
+def export_notes(
+    destination: TextIO,
+    export_format: str,
+    queryset=None,
+    chunk_size: int = 2000,
+) -> None:
+    if queryset is None:
+        queryset = Note.objects.all()
+    destination.writelines(
+        iter_export(iter_notes(queryset, chunk_size), export_format)
+    )
@@ -1,9 +1,22 @@
-from django.contrib.auth.mixins import LoginRequiredMixin
+from http import HTTPStatus
+
+from django.conf import settings
+from django.contrib.auth.mixins import (
+    LoginRequiredMixin, UserPassesTestMixin
+)
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.urls import reverse_lazy
+from django.utils.decorators import method_decorator
 from django.views import generic
+from django.views.decorators.http import condition
 
-from .forms import NoteForm
-from .models import Note
+from .cache import get_note
+from .forms import CONFLICT, WARNING, NoteForm
+from .metrics import CONTENT_TYPE, registry
+from .models import Note, VersionConflict
+from .search import search_notes
 
 
 class Home(generic.TemplateView):
@@ -25,6 +38,37 @@ class NoteBase(LoginRequiredMixin):
         """Пользователь может работать только со своими заметками."""
         return self.model.objects.filter(author=self.request.user)
 
+    def get_object(self, queryset=None):
+        """
+        При чтении берём заметку из кэша notes.cache.
+
+        Изменения и удаление работают с заметкой, прочитанной из базы.
+        """
+        if queryset is not None or self.request.method not in (
+            'GET', 'HEAD'
+        ):
+            return super().get_object(queryset)
+        note = get_note(
+            self.request.user.pk, self.kwargs[self.slug_url_kwarg]
+        )
+        if note is None:
+            raise Http404('Заметка не найдена.')
+        return note
+
+    def slug_taken(self, form, error):
+        """
+        Slug из формы заняли между проверкой clean_slug и записью.
+
+        Вместо ошибки 500 возвращаем форму с той же ошибкой, что
+        и clean_slug. Пустой slug подбирает сама модель: такую
+        IntegrityError пробрасываем дальше.
+        """
+        slug = form.cleaned_data.get('slug')
+        if not slug:
+            raise error
+        form.add_error('slug', slug + WARNING)
+        return self.form_invalid(form)
+
 
 class NoteCreate(NoteBase, generic.CreateView):
     """Добавление заметки."""
@@ -34,26 +78,158 @@ class NoteCreate(NoteBase, generic.CreateView):
     def form_valid(self, form):
         new_note = form.save(commit=False)
         new_note.author = self.request.user
-        new_note.save()
+        try:
+            with transaction.atomic():
+                new_note.save()
+        except IntegrityError as error:
+            return self.slug_taken(form, error)
         return super().form_valid(form)
 
 
 class NoteUpdate(NoteBase, generic.UpdateView):
-    """Редактирование заметки."""
+    """
+    Редактирование заметки.
+
+    Если заметку изменили после того, как пользователь открыл форму,
+    отвечаем 409: форма с его изменениями и текущая версия заметки,
+    чтобы он мог их объединить.
+    """
     template_name = 'notes/form.html'
     form_class = NoteForm
 
+    def form_valid(self, form):
+        self.object = form.save(commit=False)
+        expected = form.cleaned_data['version'] or self.object.version
+        try:
+            # Точка сохранения: конфликт не должен ломать внешнюю
+            # транзакцию, если она есть.
+            with transaction.atomic():
+                self.object.save_if_version(expected)
+        except VersionConflict:
+            return self.conflict(form)
+        except IntegrityError as error:
+            return self.slug_taken(form, error)
+        return HttpResponseRedirect(self.get_success_url())
+
+    def conflict(self, form):
+        self.object = self.get_object()
+        form.data = form.data.copy()
+        form.data['version'] = self.object.version
+        form.add_error(None, CONFLICT)
+        return self.render_to_response(
+            self.get_context_data(form=form, current=self.object),
+            status=HTTPStatus.CONFLICT,
+        )
+
 
 class NoteDelete(NoteBase, generic.DeleteView):
     """Удаление заметки."""
     template_name = 'notes/delete.html'
 
 
+def notes_list_etag(request, *args, **kwargs):
+    """
+    Версия списка заметок пользователя: число заметок и время
+    последнего изменения, одним агрегатным запросом.
+
+    Last-Modified списку не отдаём: после удаления заметки время
+    последнего изменения не меняется, а число заметок — меняется.
+    """
+    state = Note.objects.filter(author=request.user).aggregate(
+        count=Count('id'), updated_at=Max('updated_at')
+    )
+    updated_at = state['updated_at'].timestamp() if state['count'] else 0
+    return f'list-{request.user.pk}-{state["count"]}-{updated_at}'
+
+
+def note_updated_at(request, slug):
+    """
+    Время изменения заметки пользователя; None, если её нет.
+
+    Заметка берётся из того же кэша, что и в NoteBase.get_object,
+    поэтому проверка ETag обычно не обращается к базе.
+    """
+    note = get_note(request.user.pk, slug)
+    return note.updated_at if note is not None else None
+
+
+def note_etag(request, slug):
+    updated_at = note_updated_at(request, slug)
+    if updated_at is None:
+        return None
+    return f'note-{request.user.pk}-{slug}-{updated_at.timestamp()}'
+
+
+def note_last_modified(request, slug):
+    return note_updated_at(request, slug)
+
+
+@method_decorator(condition(etag_func=notes_list_etag), name='get')
 class NotesList(NoteBase, generic.ListView):
-    """Список всех заметок пользователя."""
-    template_name = 'notes/list.html'
+    """
+    Список всех заметок пользователя.
 
+    Заметки выводятся страницами по NOTES_COUNT_ON_LIST_PAGE штук.
+    Следующая страница начинается после id из параметра after, поэтому
+    любая страница читается из индекса (author_id, id) одинаково быстро.
+    """
+    template_name = 'notes/list.html'
 
+    def get_queryset(self):
+        """Только поля, которые выводятся в списке."""
+        queryset = super().get_queryset().only(
+            'id', 'slug', 'title'
+        ).order_by('id')
+        after = self.request.GET.get('after')
+        if after:
+            if not after.isdigit():
+                raise Http404('Некорректный номер заметки в параметре after.')
+            queryset = queryset.filter(id__gt=after)
+        # Берём на одну заметку больше, чтобы узнать, есть ли продолжение.
+        return queryset[:settings.NOTES_COUNT_ON_LIST_PAGE + 1]
+
+    def get_context_data(self, **kwargs):
+        notes = list(self.object_list)
+        per_page = settings.NOTES_COUNT_ON_LIST_PAGE
+        context = super().get_context_data(
+            object_list=notes[:per_page], **kwargs
+        )
+        if len(notes) > per_page:
+            context['next_cursor'] = notes[per_page - 1].id
+        return context
+
+
+@method_decorator(
+    condition(etag_func=note_etag, last_modified_func=note_last_modified),
+    name='get'
+)
 class NoteDetail(NoteBase, generic.DetailView):
     """Заметка подробно."""
     template_name = 'notes/detail.html'
+
+
+class NoteSearch(NoteBase, generic.ListView):
+    """Поиск по заметкам пользователя."""
+    template_name = 'notes/search.html'
+
+    def get_queryset(self):
+        return search_notes(
+            super().get_queryset(),
+            self.request.GET.get('q', ''),
+            settings.NOTES_COUNT_ON_LIST_PAGE,
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        return context
+
+
+class Metrics(UserPassesTestMixin, generic.View):
+    """Метрики представлений в формате Prometheus (только для персонала)."""
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)